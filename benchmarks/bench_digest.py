@@ -0,0 +1,61 @@
+"""Content digest throughput per algorithm and hash thread count.
+
+Run from the repository root:
+
+    python benchmarks/bench_digest.py [--files 16] [--size-mb 32] [--threads 1,2,4,8]
+
+The files are read once before timing, so the numbers are for a warm page
+cache and measure hashing cost rather than disk speed.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from volume_backup_sorter.hashing import digest_file  # noqa: E402
+from volume_backup_sorter.models import HashAlgo  # noqa: E402
+
+
+def _make_sources(root: Path, files: int, size: int) -> list[Path]:
+    out = []
+    for i in range(files):
+        p = root / f"src_{i:04d}.bin"
+        p.write_bytes(os.urandom(size))
+        out.append(p)
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=16)
+    ap.add_argument("--size-mb", type=int, default=32)
+    ap.add_argument("--chunk-mb", type=int, default=4)
+    ap.add_argument("--threads", type=str, default="1,2,4,8")
+    args = ap.parse_args()
+
+    chunk = args.chunk_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as d:
+        srcs = _make_sources(Path(d), args.files, args.size_mb * 1024 * 1024)
+        total = sum(p.stat().st_size for p in srcs)
+        for p in srcs:
+            p.read_bytes()
+
+        for algo in (HashAlgo.SHA256, HashAlgo.BLAKE2B):
+            for n in (int(x) for x in args.threads.split(",")):
+                t0 = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=n) as pool:
+                    list(pool.map(lambda p: digest_file(p, chunk, algo), srcs))
+                dt = time.perf_counter() - t0
+                print(f"{algo:<8} threads={n:<3} {total / dt / 1e6:9.1f} MB/s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
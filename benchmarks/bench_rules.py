@@ -0,0 +1,123 @@
+"""Rule evaluation cost: per-file rule loop vs. compiled RuleMatcher, per file and per folder.
+
+Run from the repository root:
+
+    python benchmarks/bench_rules.py [--paths 1000000] [--rules 50]
+
+Builds synthetic camera/document paths and a profile of --rules rules mixing
+extension, MIME, regex, path and size conditions, then resolves every path
+both ways and checks that the destinations are identical.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from volume_backup_sorter.fsops import guess_mime, sanitize_folder_name  # noqa: E402
+from volume_backup_sorter.models import Rule, default_rules  # noqa: E402
+from volume_backup_sorter.planner import RuleMatcher, SourceEntry, rule_matches  # noqa: E402
+
+_EXTS = ["jpg", "JPG", "cr2", "nef", "mp4", "mov", "pdf", "docx", "txt", "zip", "py", "xmp", "heic", "wav", ""]
+
+
+def _legacy_dest(rules: list[Rule], target_root: Path, src: Path, size: int) -> Path:
+    # dest_for_rules() before the matcher: everything recomputed per file and rule
+    mime = guess_mime(src)
+    regex_cache: dict[str, re.Pattern | None] = {}
+    for r in rules:
+        if rule_matches(r, src, mime, size, regex_cache):
+            return target_root / sanitize_folder_name(r.target_folder) / src.name
+    return target_root / "misc" / src.name
+
+
+def _make_rules(n: int, rnd: random.Random) -> list[Rule]:
+    rules = []
+    while len(rules) < n - len(default_rules()):
+        i = len(rules)
+        kind = i % 5
+        r = Rule(True, f"r{i}", f"folder{i}")
+        if kind == 0:
+            r.extensions = rnd.sample([e.lower() for e in _EXTS if e], 3)
+        elif kind == 1:
+            r.mime_prefixes = [rnd.choice(["image/", "video/", "audio/", "application/pdf"])]
+            r.size_min_mb = rnd.choice([0, 1, 5])
+        elif kind == 2:
+            r.name_regex = rf"^(IMG|DSC)_{i % 10}\d+"
+        elif kind == 3:
+            r.path_contains = f"trip{i % 7}"
+            r.extensions = ["jpg", "cr2"]
+        else:
+            r.extensions = [rnd.choice(["mp4", "mov"])]
+            r.size_max_mb = rnd.choice([10, 100])
+        rules.append(r)
+    return rules + default_rules()
+
+
+def _make_paths(n: int, rnd: random.Random) -> list[tuple[Path, int]]:
+    out = []
+    for i in range(n):
+        folder = f"/media/card{i % 3}/DCIM/trip{i % 11}/{100 + i // 5000}CANON"
+        prefix = rnd.choice(["IMG", "DSC", "VID", "scan", "notes"])
+        ext = rnd.choice(_EXTS)
+        name = f"{prefix}_{i:06d}" + (f".{ext}" if ext else "")
+        out.append((Path(folder) / name, rnd.randrange(0, 200 * 1024 * 1024)))
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--paths", type=int, default=1_000_000)
+    ap.add_argument("--rules", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    rules = _make_rules(args.rules, rnd)
+    paths = _make_paths(args.paths, rnd)
+    target = Path("/backup")
+
+    t0 = time.perf_counter()
+    legacy = [_legacy_dest(rules, target, p, size) for p, size in paths]
+    t_legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    matcher = RuleMatcher(rules)
+    compiled = [matcher.dest(target, p, size) for p, size in paths]
+    t_compiled = time.perf_counter() - t0
+
+    # Per folder, as BackupEngine.run() does with scan_dirs() batches
+    folders: dict[Path, list[SourceEntry]] = {}
+    for p, size in paths:
+        st = os.stat_result((0, 0, 0, 0, 0, 0, size, 0, 0, 0))
+        folders.setdefault(p.parent, []).append(SourceEntry(p, st, False, p.name))
+    t0 = time.perf_counter()
+    matcher = RuleMatcher(rules)
+    batched = [matcher.folders_for_dir(entries) for entries in folders.values()]
+    t_batched = time.perf_counter() - t0
+    batched_dests = {
+        e.path: matcher.dest_in(target, folder, e.path)
+        for entries, names in zip(folders.values(), batched)
+        for e, folder in zip(entries, names)
+    }
+
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+    mismatches += sum(1 for (p, _), a in zip(paths, legacy) if batched_dests[p] != a)
+    n = len(paths)
+    print(f"rules={len(rules)} paths={n} folders={len(folders)}")
+    print(f"per-file loop    {t_legacy:7.2f} s  {n / t_legacy:10.0f} paths/s")
+    print(f"RuleMatcher      {t_compiled:7.2f} s  {n / t_compiled:10.0f} paths/s  x{t_legacy / t_compiled:.1f}")
+    print(f"per folder (*)   {t_batched:7.2f} s  {n / t_batched:10.0f} paths/s  x{t_legacy / t_batched:.1f}")
+    print("(*) target folder names only; the engine joins the path for files it copies")
+    print(f"mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
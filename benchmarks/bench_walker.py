@@ -0,0 +1,98 @@
+"""Source enumeration throughput vs. scan threads.
+
+Run from the repository root:
+
+    python benchmarks/bench_walker.py [--dirs 400] [--files 20] [--latency-ms 2]
+
+Network shares cost a round-trip per folder listing and per stat. The
+benchmark builds a local tree and adds --latency-ms to every scandir() and
+DirEntry.stat() call to approximate that, then walks it with 1..N threads.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from volume_backup_sorter import planner  # noqa: E402
+
+
+class _SlowEntry:
+    def __init__(self, entry: os.DirEntry, delay: float):
+        self._e = entry
+        self._delay = delay
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, *, follow_symlinks: bool = True) -> bool:
+        return self._e.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self) -> bool:
+        return self._e.is_symlink()
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result:
+        time.sleep(self._delay)
+        return self._e.stat(follow_symlinks=follow_symlinks)
+
+
+class _SlowScandir:
+    def __init__(self, scandir, path: str, delay: float):
+        time.sleep(delay)
+        self._it = scandir(path)
+        self._delay = delay
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._it.close()
+
+    def __iter__(self):
+        for e in self._it:
+            yield _SlowEntry(e, self._delay)
+
+
+def _make_tree(root: Path, dirs: int, files: int) -> None:
+    # A few levels deep and wide, like a photo archive (year/month/event)
+    for i in range(dirs):
+        d = root / f"y{i % 5}" / f"m{i % 12}" / f"e{i}"
+        d.mkdir(parents=True, exist_ok=True)
+        for j in range(files):
+            (d / f"f{j}.jpg").write_bytes(b"x")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dirs", type=int, default=400)
+    ap.add_argument("--files", type=int, default=20)
+    ap.add_argument("--latency-ms", type=float, default=2.0)
+    ap.add_argument("--threads", type=str, default="1,2,4,8,16")
+    args = ap.parse_args()
+
+    delay = args.latency_ms / 1000.0
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        _make_tree(root, args.dirs, args.files)
+
+        real_scandir = planner.os.scandir
+        planner.os.scandir = lambda p: _SlowScandir(real_scandir, p, delay)  # type: ignore[assignment]
+        try:
+            base = None
+            for n in (int(x) for x in args.threads.split(",")):
+                t0 = time.perf_counter()
+                count = sum(1 for _ in planner.scan_files([str(root)], False, n))
+                dt = time.perf_counter() - t0
+                base = base or dt
+                print(f"threads={n:<3} files={count:<7} {dt:7.2f} s  {count / dt:9.0f} files/s  x{base / dt:.1f}")
+        finally:
+            planner.os.scandir = real_scandir
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,14 +1,150 @@
 from __future__ import annotations
 
 import argparse
+import signal
+import sys
+import threading
 
-from .app import run_gui
+# Only the GUI path imports PyQt6 (through .app): "run" and "preview" work on
+# headless machines and start quickly, so everything is imported where it is used
 
 
-def main() -> int:
-    # Keep CLI simple: GUI by default
+def _find_profile(cfg, name: str):
+    if not name:
+        return next((p for p in cfg.profiles if p.id == cfg.active_profile_id), cfg.profiles[0])
+    for p in cfg.profiles:
+        if p.name == name or p.id == name:
+            return p
+    folded = name.casefold()
+    for p in cfg.profiles:
+        if p.name.casefold() == folded:
+            return p
+    return None
+
+
+def _print_summary(res, dry_run: bool, lang: str) -> None:
+    if dry_run:
+        from .i18n import I18N
+
+        i18n = I18N(lang)
+        rows = [
+            ("preview.files_total", res.total_sources),
+            ("preview.copy", res.copied),
+            ("preview.skip_dup", res.skipped_duplicates),
+            ("preview.skip_unchanged", res.skipped_unchanged),
+            ("preview.skip_missing", res.skipped_missing_sources),
+            ("preview.move_mirror", res.moved_mirror),
+            ("preview.delete_mirror", res.deleted_mirror),
+            ("preview.bytes", res.bytes_copied),
+        ]
+        for key, value in rows:
+            print(f"{i18n.t(key)} {value}")
+        return
+    print(
+        f"Copied: {res.copied} ({res.bytes_copied} bytes), dup skipped: {res.skipped_duplicates}, "
+        f"unchanged: {res.skipped_unchanged}, missing: {res.skipped_missing_sources}, "
+        f"mirror moved: {res.moved_mirror}, mirror deleted: {res.deleted_mirror}, failed: {res.failed}"
+    )
+
+
+def _run_headless(args: argparse.Namespace, dry_run: bool) -> int:
+    from .config_store import load_config, save_config
+    from .engine import BackupEngine, RunEvents
+    from .models import BackupMode, MirrorDeleteScope
+
+    cfg = load_config()
+    prof = _find_profile(cfg, args.profile)
+    if prof is None:
+        names = ", ".join(p.name for p in cfg.profiles)
+        print(f"Unknown profile: {args.profile} (available: {names})", file=sys.stderr)
+        return 2
+
+    # Same safeguard as the typed "DELETE" confirmation in the GUI
+    if (
+        not dry_run
+        and prof.mode == BackupMode.MIRROR_TREE
+        and prof.mirror_delete_scope == MirrorDeleteScope.WHOLE_TARGET
+        and not args.yes
+    ):
+        print(
+            f"Profile '{prof.name}' deletes files anywhere in the target that are missing in the sources. "
+            "Run 'preview' first, then pass --yes to confirm.",
+            file=sys.stderr,
+        )
+        return 2
+
+    # Events arrive from the hash and copy threads as well
+    out_lock = threading.Lock()
+    errors: list[str] = []
+
+    def on_message(s: str) -> None:
+        with out_lock:
+            print(s, flush=True)
+
+    def on_error(s: str) -> None:
+        with out_lock:
+            errors.append(s)
+            print("[ERROR] " + s, file=sys.stderr, flush=True)
+
+    engine = BackupEngine(
+        prof, args.target, args.sources, dry_run,
+        RunEvents(message=None if args.quiet else on_message, error=on_error),
+    )
+    # Ctrl+C, or SIGTERM from a scheduler, stops the run cleanly: the engine finishes
+    # the files in progress and closes its databases
+    cancelled = []
+
+    def on_signal(signum, frame) -> None:
+        # Runs on the main thread between two steps of the run: no printing here
+        cancelled.append(signum)
+        engine.stop()
+
+    previous = {sig: signal.signal(sig, on_signal) for sig in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        res = engine.run()
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+
+    if cancelled:
+        print("Cancelled.", file=sys.stderr)
+    if not dry_run:
+        # Keeps the per-source incremental marks of this run
+        save_config(cfg)
+    _print_summary(res, dry_run, cfg.language)
+    if cancelled:
+        return 130
+    return 1 if errors or res.failed else 0
+
+
+def _add_run_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--profile", default="", help="Profile name or id (default: the active profile)")
+    p.add_argument("--target", required=True, help="Target folder")
+    p.add_argument("sources", nargs="+", metavar="SRC", help="Source files or folders")
+    p.add_argument("-q", "--quiet", action="store_true", help="Only print errors and the summary")
+
+
+def main(argv: list[str] | None = None) -> int:
+    # GUI by default; "run" and "preview" run a profile without it
     parser = argparse.ArgumentParser(prog="volume-backup-sorter")
     parser.add_argument("--gui", action="store_true", help="Start GUI (default)")
-    args = parser.parse_args()
-    return run_gui()
+    sub = parser.add_subparsers(dest="command")
+
+    p_run = sub.add_parser("run", help="Run a profile without the GUI")
+    _add_run_args(p_run)
+    p_run.add_argument(
+        "--yes", action="store_true",
+        help="Confirm mirror deletes in the whole target (the GUI asks to type DELETE)",
+    )
+    p_preview = sub.add_parser("preview", help="Show what a run would do, without changing anything")
+    _add_run_args(p_preview)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return _run_headless(args, dry_run=False)
+    if args.command == "preview":
+        return _run_headless(args, dry_run=True)
 
+    from .app import run_gui
+
+    return run_gui()
@@ -0,0 +1,984 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, Future, wait
+
+from .models import (
+    Profile, BackupMode, ConflictStrategy, SymlinkMode,
+    MirrorDeleteScope, now_utc
+)
+from .hashing import FINGERPRINT_BYTES, digest_file, fingerprint_file
+from .fsops import (
+    DestNameRegistry,
+    DirCache,
+    stage_copy,
+    commit_staged,
+    discard_staged,
+    copy_symlink,
+    is_staged_name,
+    should_follow_symlink,
+)
+from .index_db import IndexDB, MirrorRecord
+from .source_cache import SourceHashCache
+from .paths import app_state_dir
+from .planner import SourceEntry, WalkStats, RuleMatcher, scan_dirs, dest_for_mirror
+from .loggers import build_logger
+
+
+# Allowed mtime difference for the mirror quick-check without a manifest row
+MIRROR_MTIME_WINDOW_NS = 2_000_000_000
+# Target folders modified this recently are not recorded as unchanged (see _index_target)
+DIR_RACY_WINDOW_NS = 2_000_000_000
+# Hash-stage back-pressure in run(): bytes of pending reads queued per hash thread.
+# One file never counts for more than this, so a huge file cannot hold the budget.
+HASH_QUEUE_BYTES_PER_THREAD = 128 * 1024 * 1024
+# Same for the copy stage: when it is full the dispatcher (and so the hash stage) waits
+COPY_QUEUE_BYTES_PER_THREAD = 256 * 1024 * 1024
+# Temp files of an interrupted run older than this are removed while indexing the target
+STAGED_STALE_NS = 3600 * 1_000_000_000
+
+
+@dataclass
+class RunResult:
+    total_sources: int = 0
+    copied: int = 0
+    skipped_duplicates: int = 0
+    skipped_missing_sources: int = 0
+    deleted_mirror: int = 0
+    skipped_unchanged: int = 0
+    moved_mirror: int = 0
+    bytes_copied: int = 0
+    failed: int = 0
+
+
+@dataclass
+class RunEvents:
+    # Callbacks of a run, all optional. message and progress are also called from
+    # the hash and copy threads, so handlers must be thread-safe.
+    message: Callable[[str], None] | None = None
+    error: Callable[[str], None] | None = None
+    progress: Callable[[int, int], None] | None = None  # current, total
+    phase: Callable[[str], None] | None = None
+
+
+class BackupEngine:
+    # The backup run itself, free of any GUI toolkit: the Qt worker and the CLI
+    # both drive it through RunEvents
+
+    def __init__(self, profile: Profile, target_dir: str, sources: list[str], dry_run: bool,
+                 events: RunEvents | None = None):
+        self.events = events or RunEvents()
+        self.profile = profile
+        self.target_root = Path(target_dir).expanduser().resolve()
+        self.sources = sources[:]
+        self.dry_run = dry_run
+
+        self._stop = threading.Event()
+        self._log = build_logger()
+
+        self._db_path = self.target_root / ".vbs_index.sqlite"
+        self._db: IndexDB | None = None
+        self._src_cache: SourceHashCache | None = None
+
+        self._total = 0
+        self._done = 0
+
+        self._known_hashes: set[str] = set()
+        self._known_sizes: set[int] = set()
+        self._known_fps: set[str] = set()
+        # Target files whose index row holds a digest of another algorithm, by size
+        self._stale_by_size: dict[int, list[str]] = {}
+        self._algo = profile.hash_algo
+        self._reserved_hashes: set[str] = set()
+        self._dest_names = DestNameRegistry()
+        self._dirs = DirCache()
+        self._lock = threading.Lock()
+
+        self._mirror_keep: set[Path] = set()
+        self._mirror_manifest: dict[str, MirrorRecord] = {}
+        self._mirror_updates: dict[str, MirrorRecord] = {}
+        self._copy_methods: dict[str, int] = {}
+        self._mirror_by_ident: dict[tuple[int, int, int, int], str] = {}
+        self._mirror_by_stat: dict[tuple[int, int], list[str]] = {}
+        self._mirror_moved_from: set[Path] = set()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def _error(self, s: str) -> None:
+        if self.events.error:
+            self.events.error(s)
+        try:
+            self._log.error(s)
+        except Exception:
+            pass
+
+    def _progress(self, cur: int, total: int) -> None:
+        if self.events.progress:
+            self.events.progress(cur, total)
+
+    def _phase(self, ph: str) -> None:
+        if self.events.phase:
+            self.events.phase(ph)
+
+    def _emit(self, s: str) -> None:
+        if self.events.message:
+            self.events.message(s)
+        try:
+            self._log.info(s)
+        except Exception:
+            pass
+
+    def _open_db(self) -> None:
+        self._db = IndexDB(self._db_path, self.target_root)
+        self._db.open()
+        try:
+            self._src_cache = SourceHashCache(app_state_dir() / "source_hashes.sqlite")
+            self._src_cache.open()
+        except Exception as e:
+            self._src_cache = None
+            self._emit(f"Source hash cache unavailable: {e}")
+
+    def _close_db(self) -> None:
+        if self._db:
+            self._db.close()
+            if self._db.writer_error is not None:
+                self._emit(f"Index DB write failed: {self._db.writer_error}")
+            self._db = None
+        if self._src_cache:
+            self._src_cache.close()
+            self._src_cache = None
+
+    def _index_target(self) -> None:
+        assert self._db is not None
+        self._phase("index")
+
+        # Keys are plain str paths, matching IndexDB rows; the same pass yields the
+        # set of live rows, so stale ones are dropped without reading the table again.
+        # A directory whose mtime and entry count match its dirs row has not gained,
+        # lost or renamed entries since it was last listed: its cached file rows are
+        # trusted without stat()ing them and only its known subdirectories are visited.
+        seen: set[str] = set()
+        seen_dirs: set[str] = set()
+        db_name = self._db_path.name
+        cached_files, cached_dirs = self._db.children()
+        racy_after = time.time_ns() - DIR_RACY_WINDOW_NS
+        staged_stale = time.time_ns() - STAGED_STALE_NS
+        listed = trusted = 0
+        self._emit(f"Indexing target (DB cache, {self._db.count()} rows)…")
+
+        stack = [str(self.target_root)]
+        while stack:
+            if self._stopped():
+                return
+            d = stack.pop()
+            try:
+                dst = os.stat(d)
+            except Exception:
+                continue
+            seen_dirs.add(d)
+
+            files = cached_files.get(d, [])
+            subdirs = cached_dirs.get(d, [])
+            if self._db.get_dir(d) == (dst.st_mtime_ns, len(files) + len(subdirs)):
+                trusted += 1
+                for p in files:
+                    seen.add(p)
+                    rec = self._db.get(p)
+                    if rec is not None:
+                        self._index_file(p, rec.size, rec.mtime_ns, rec)
+                stack.extend(subdirs)
+                continue
+
+            listed += 1
+            entries = 0
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        if e.name.startswith(db_name):
+                            continue
+                        if is_staged_name(e.name):
+                            # Left by a crashed run, never a backed-up file. A recent one
+                            # may belong to a run still in progress and is left alone.
+                            try:
+                                if not self.dry_run and e.stat(follow_symlinks=False).st_mtime_ns < staged_stale:
+                                    os.unlink(e.path)
+                            except Exception:
+                                pass
+                            continue
+                        try:
+                            if e.is_dir():
+                                # Same as os.walk: symlinked folders are not descended
+                                if not e.is_symlink():
+                                    stack.append(e.path)
+                                    entries += 1
+                                continue
+                        except Exception:
+                            continue
+                        entries += 1
+                        seen.add(e.path)
+                        try:
+                            st = os.stat(e.path)
+                            self._index_file(e.path, st.st_size, st.st_mtime_ns, self._db.get(e.path))
+                        except Exception:
+                            continue
+            except Exception:
+                continue
+            # A folder modified within the mtime granularity of this scan may change
+            # again without a visible mtime change, so it is listed again next time.
+            if dst.st_mtime_ns < racy_after:
+                self._db.set_dir(d, dst.st_mtime_ns, entries)
+
+        try:
+            removed = self._db.cleanup_missing(seen, seen_dirs)
+            if removed:
+                self._emit(f"DB cleanup removed {removed} stale rows.")
+        except Exception:
+            pass
+
+        self._emit(
+            f"Target index ready. Unique files: {len(self._known_hashes)} "
+            f"({listed} folders listed, {trusted} unchanged)"
+        )
+        stale = sum(len(v) for v in self._stale_by_size.values())
+        if stale:
+            self._emit(f"{stale} indexed files use another hash algorithm; they are rehashed only when compared.")
+
+    def _index_file(self, p: str, size: int, mtime_ns: int, rec) -> None:
+        assert self._db is not None
+        try:
+            if rec and rec.size == size and rec.mtime_ns == mtime_ns and rec.digest:
+                h = rec.digest
+                fp = rec.fp
+                if not fp:
+                    fp = fingerprint_file(Path(p))
+                    self._db.set(p, size, mtime_ns, h, fp, rec.algo)
+                if rec.algo != self._algo:
+                    # Indexed under another algorithm (the profile was switched): size and
+                    # fingerprint still gate duplicates, the digest is only recomputed when
+                    # a source of this size has to be compared in full (_upgrade_stale).
+                    self._stale_by_size.setdefault(int(size), []).append(p)
+                    self._known_sizes.add(int(size))
+                    self._known_fps.add(fp)
+                    return
+            else:
+                h = self._digest(Path(p))
+                fp = fingerprint_file(Path(p))
+                self._db.set(p, size, mtime_ns, h, fp, self._algo)
+        except Exception:
+            return
+        self._known_hashes.add(h)
+        self._known_sizes.add(int(size))
+        self._known_fps.add(fp)
+
+    def _upgrade_stale(self, size: int) -> None:
+        # Rehash the target files of this size still indexed under another algorithm,
+        # before a source digest is checked against _known_hashes. Each one is hashed
+        # at most once and its row is rewritten, so the index converges over time.
+        assert self._db is not None
+        for p in self._stale_by_size.pop(size, []):
+            try:
+                st = os.stat(p)
+                h = self._digest(Path(p))
+                rec = self._db.get(p)
+                fp = rec.fp if rec and rec.size == st.st_size and rec.fp else fingerprint_file(Path(p))
+                self._db.set(p, st.st_size, st.st_mtime_ns, h, fp, self._algo)
+            except Exception:
+                continue
+            with self._lock:
+                self._known_hashes.add(h)
+
+    def _chunk_size(self) -> int:
+        return self.profile.perf.hash_chunk_mb * 1024 * 1024
+
+    def _mmap_min(self) -> int:
+        return self.profile.perf.mmap_min_mb * 1024 * 1024
+
+    def _digest(self, p: Path) -> str:
+        return digest_file(p, self._chunk_size(), self._algo, self._mmap_min(), self.profile.perf.io_policy)
+
+    def _hash_source(self, src: Path, st: os.stat_result | None = None) -> str:
+        if self._src_cache is None:
+            return self._digest(src)
+        st = st or src.stat()
+        rec = self._src_cache.get(st)
+        if rec and rec.digest and rec.algo == self._algo:
+            return rec.digest
+        h = self._digest(src)
+        self._src_cache.put(st, digest=h, algo=self._algo)
+        return h
+
+    def _fingerprint_source(self, src: Path, st: os.stat_result | None = None) -> str:
+        if self._src_cache is None:
+            return fingerprint_file(src)
+        st = st or src.stat()
+        rec = self._src_cache.get(st)
+        if rec and rec.fp:
+            return rec.fp
+        fp = fingerprint_file(src)
+        self._src_cache.put(st, fp=fp)
+        return fp
+
+    def _needs_prehash(self, entry: SourceEntry) -> bool:
+        # Regular files are hashed while they are copied (one read per file), after the
+        # size and fingerprint gates in run(). Recreated symlinks are never read by the
+        # copy stage, and a dry run with hash renaming needs the hash for every name.
+        if entry.is_link and self.profile.symlinks == SymlinkMode.LINK:
+            return True
+        return self.dry_run and self.profile.conflict == ConflictStrategy.RENAME_HASH
+
+    def _reserve_hash(self, h: str) -> bool:
+        with self._lock:
+            if h in self._known_hashes or h in self._reserved_hashes:
+                return False
+            self._reserved_hashes.add(h)
+            return True
+
+    def _claim_dest(self, dest: Path, h: str) -> Path:
+        # Resolve the final name and reserve it atomically, copy threads run this concurrently
+        strategy = self.profile.conflict
+        if self.profile.mode == BackupMode.MIRROR_TREE:
+            # A mirror path belongs to exactly one source file: changed files replace it
+            strategy = ConflictStrategy.OVERWRITE
+        dest_final = self._dest_names.claim(dest, strategy, h)
+        if self.profile.mode == BackupMode.MIRROR_TREE:
+            with self._lock:
+                self._mirror_keep.add(dest_final)
+        return dest_final
+
+    def _mirror_base_root(self) -> Path:
+        if self.profile.mirror_delete_scope == MirrorDeleteScope.SUBFOLDER:
+            sub = (self.profile.mirror_scope_subdir or "mirror").strip() or "mirror"
+            base = (self.target_root / sub).resolve()
+        else:
+            base = self.target_root.resolve()
+
+        try:
+            base.relative_to(self.target_root.resolve())
+        except Exception:
+            base = self.target_root.resolve()
+        return base
+
+    def _mirror_dest(self, entry: SourceEntry, base: Path) -> Path:
+        # Relative to the source root the entry was found under; a single-file source
+        # mirrors into the base folder under its own name
+        return dest_for_mirror(base, entry)
+
+    def _mirror_unchanged(self, src_st: os.stat_result, src: Path, dest: Path) -> bool:
+        # rsync-style quick check: trust size + mtime, against the manifest when we have one
+        try:
+            dst_st = dest.stat()
+        except Exception:
+            return False
+        rec = self._mirror_manifest.get(str(dest))
+        if rec is not None:
+            same = (
+                rec.src_size == src_st.st_size
+                and rec.src_mtime_ns == src_st.st_mtime_ns
+                and rec.dest_size == dst_st.st_size
+                and rec.dest_mtime_ns == dst_st.st_mtime_ns
+            )
+        else:
+            # No manifest row yet (first run after an upgrade, or copied by hand):
+            # compare against the destination itself, FAT stores mtimes in 2 s steps.
+            same = (
+                dst_st.st_size == src_st.st_size
+                and abs(dst_st.st_mtime_ns - src_st.st_mtime_ns) <= MIRROR_MTIME_WINDOW_NS
+            )
+        if not same:
+            return False
+
+        sha = rec.digest if rec is not None and rec.algo == self._algo else ""
+        if self.profile.mirror_checksum:
+            try:
+                src_h = self._hash_source(src, src_st)
+                if src_h != (sha or self._digest(dest)):
+                    return False
+                sha = src_h
+            except Exception:
+                return False
+
+        # Rows from before the algorithm was switched are rewritten once a new digest exists
+        if (rec is None or (sha and rec.algo != self._algo)) and not self.dry_run:
+            self._record_mirror(dest, src_st, dst_st, sha)
+        return True
+
+    def _record_mirror(self, dest: Path, src_st: os.stat_result, dst_st: os.stat_result, sha: str) -> None:
+        rec = MirrorRecord(
+            int(src_st.st_size), int(src_st.st_mtime_ns), int(dst_st.st_size), int(dst_st.st_mtime_ns), sha,
+            int(src_st.st_dev), int(src_st.st_ino), self._algo,
+        )
+        with self._lock:
+            self._mirror_updates[str(dest)] = rec
+
+    def _load_mirror_manifest(self) -> None:
+        assert self._db is not None
+        try:
+            self._mirror_manifest = self._db.load_mirror()
+        except Exception:
+            self._mirror_manifest = {}
+        for path, rec in self._mirror_manifest.items():
+            if rec.src_ino:
+                self._mirror_by_ident[(rec.src_dev, rec.src_ino, rec.src_size, rec.src_mtime_ns)] = path
+            if rec.digest and rec.algo == self._algo:
+                self._mirror_by_stat.setdefault((rec.src_size, rec.src_mtime_ns), []).append(path)
+
+    def _mirror_move_sources(self, src_st: os.stat_result, dest: Path) -> tuple[list[str], bool]:
+        # Mirror paths this new destination may be moved from, and whether the content
+        # still has to be verified (True) or the source identity already matched (False)
+        key = str(dest)
+        if key in self._mirror_manifest or dest.exists():
+            return [], False
+        ident = (int(src_st.st_dev), int(src_st.st_ino), int(src_st.st_size), int(src_st.st_mtime_ns))
+        old = self._mirror_by_ident.get(ident) if src_st.st_ino else None
+        if old and old != key:
+            return [old], False
+        same_stat = self._mirror_by_stat.get((int(src_st.st_size), int(src_st.st_mtime_ns)), [])
+        return [p for p in same_stat if p != key], True
+
+    def _try_mirror_move(
+        self, src: Path, src_st: os.stat_result, dest: Path, olds: list[str], verify: bool, used: set[str]
+    ) -> bool:
+        # Runs after enumeration, when _mirror_keep is complete: an old mirror path can
+        # only be moved away if no current source maps to it any more.
+        src_h = ""
+        for old in olds:
+            op = Path(old)
+            rec = self._mirror_manifest.get(old)
+            if old in used or rec is None or op in self._mirror_keep:
+                continue
+            try:
+                ost = op.stat()
+            except Exception:
+                continue
+            if ost.st_size != rec.dest_size or ost.st_mtime_ns != rec.dest_mtime_ns:
+                continue
+            if verify:
+                try:
+                    src_h = src_h or self._hash_source(src, src_st)
+                except Exception:
+                    return False
+                if src_h != rec.digest:
+                    continue
+
+            used.add(old)
+            if self.dry_run:
+                self._mirror_moved_from.add(op)
+                self._emit(f"[Would move] {op} -> {dest}")
+                return True
+            try:
+                self._dirs.ensure(dest.parent)
+                os.replace(op, dest)
+                self._record_mirror(dest, src_st, dest.stat(), rec.digest if rec.algo == self._algo else "")
+            except Exception as e:
+                self._emit(f"[Move failed] {op} -> {dest}: {e}")
+                return False
+            self._emit(f"[Moved] {op} -> {dest}")
+            return True
+        return False
+
+    def _save_mirror_manifest(self) -> None:
+        assert self._db is not None
+        with self._lock:
+            updates = self._mirror_updates
+            self._mirror_updates = {}
+        try:
+            self._db.set_mirror_many(updates)
+            stale = [
+                k for k in self._mirror_manifest
+                if k not in updates and Path(k) not in self._mirror_keep and not Path(k).exists()
+            ]
+            self._db.delete_mirror_many(stale)
+        except Exception as e:
+            self._emit(f"Mirror manifest not saved: {e}")
+
+    @staticmethod
+    def _root_key(raw: str) -> str:
+        try:
+            return str(Path(raw).expanduser().resolve())
+        except Exception:
+            return str(Path(raw).expanduser())
+
+    def _incremental_mark(self, raw: str) -> float:
+        # Roots without a mark of their own are copied in full. Profiles saved before
+        # per-root marks existed fall back to the single global timestamp.
+        marks = self.profile.last_run_by_root or {}
+        if not marks:
+            return float(self.profile.last_run_utc or 0.0)
+        return float(marks.get(self._root_key(raw), 0.0))
+
+    def _delete_allowed(self, p: Path) -> bool:
+        wl = {x.lower().lstrip(".") for x in (self.profile.mirror_delete_ext_whitelist or []) if str(x).strip()}
+        if not wl:
+            return True
+        ext = p.suffix.lower().lstrip(".")
+        return ext in wl
+
+    def run(self) -> RunResult:
+        res = RunResult()
+        try:
+            if not self.target_root.is_dir():
+                self._error("Target folder does not exist or is not a folder.")
+                return res
+
+            run_started = now_utc()
+            # Sources are enumerated once, while the run proceeds; until the walk is
+            # done, progress is measured against the walker's running estimate
+            walk = WalkStats()
+            self._total = 0
+            self._done = 0
+            self._progress(self._done, 1)
+
+            # Modes, read by the walk loop and the nested stages below
+            dedup = self.profile.mode in (BackupMode.ARCHIVE_RULES, BackupMode.INCREMENTAL_RULES)
+            incremental = self.profile.mode == BackupMode.INCREMENTAL_RULES
+            mirror = self.profile.mode == BackupMode.MIRROR_TREE
+
+            self._open_db()
+            if dedup:
+                self._index_target()
+
+            mirror_base = self._mirror_base_root()
+            if mirror:
+                self._load_mirror_manifest()
+
+            rules = RuleMatcher(self.profile.rules)
+            hash_workers = self.profile.perf.hash_threads
+            copy_workers = self.profile.perf.copy_threads
+
+            self._phase("run")
+
+            with ThreadPoolExecutor(max_workers=hash_workers) as hash_pool, ThreadPoolExecutor(max_workers=copy_workers) as copy_pool:
+                in_flight: set[Future] = set()
+                in_flight_bytes = 0
+                max_in_flight_bytes = hash_workers * 2 * HASH_QUEUE_BYTES_PER_THREAD
+                max_in_flight = max(8, hash_workers * 16)
+                copy_cv = threading.Condition()
+                copy_queued = 0
+                copy_queued_bytes = 0
+                max_copy_queued = max(8, copy_workers * 32)
+                max_copy_queued_bytes = copy_workers * 2 * COPY_QUEUE_BYTES_PER_THREAD
+
+                # Dedup gates, only touched by this thread:
+                # 1. size: a size that is neither in the target index nor seen earlier in this
+                #    batch cannot belong to a duplicate, the file is hashed while copying.
+                # 2. fingerprint: on a size collision, hash only head + tail first; the full
+                #    hash runs only if the fingerprint collides as well.
+                seen_sizes: set[int] = set()
+                size_first: dict[int, SourceEntry] = {}
+                fp_owner: dict[str, SourceEntry | None] = {}
+                fingerprinted = 0
+                prehashed = 0
+                move_candidates: list[tuple[SourceEntry, Path, list[str], bool]] = []
+                # Rule target folders computed per source folder by the walk loop, until used
+                planned: dict[Path, str] = {}
+
+                def submit(stage: str, fn, ent: SourceEntry):
+                    nonlocal fingerprinted, prehashed, in_flight_bytes
+                    if stage == "fp":
+                        fingerprinted += 1
+                        cost = min(ent.size, 2 * FINGERPRINT_BYTES)
+                    else:
+                        prehashed += 1
+                        cost = ent.size
+                    fut = hash_pool.submit(fn, ent.path, ent.st)
+                    fut._src = ent  # type: ignore[attr-defined]
+                    fut._stage = stage  # type: ignore[attr-defined]
+                    fut._cost = min(cost, HASH_QUEUE_BYTES_PER_THREAD)  # type: ignore[attr-defined]
+                    in_flight_bytes += fut._cost  # type: ignore[attr-defined]
+                    in_flight.add(fut)
+
+                def reap():
+                    # Handle whatever finished first; consume() may submit follow-up work
+                    nonlocal in_flight_bytes
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        in_flight.discard(f)
+                        in_flight_bytes -= f._cost  # type: ignore[attr-defined]
+                    for f in done:
+                        consume(f)
+
+                def register_fp(fp: str, ent: SourceEntry) -> bool:
+                    if fp in self._known_fps or fp in fp_owner:
+                        return False
+                    fp_owner[fp] = ent
+                    return True
+
+                def finish_one():
+                    self._done += 1
+                    total = self._total or walk.estimate()
+                    self._progress(self._done, max(1, self._done, total))
+                    if self._src_cache is not None and self._src_cache.pending() >= 1000:
+                        self._src_cache.flush()
+
+                def on_fingerprint(sp: SourceEntry, fp: str, known_hash: str = ""):
+                    if register_fp(fp, sp):
+                        handle_one(sp, known_hash)
+                        finish_one()
+                        return
+                    owner = fp_owner.get(fp)
+                    if owner is not None and self.dry_run:
+                        # The copy stage reserves the owner's hash, but a dry run never
+                        # copies it, so reserve it before this file is decided.
+                        fp_owner[fp] = None
+                        try:
+                            self._reserve_hash(self._hash_source(owner.path, owner.st))
+                        except Exception:
+                            pass
+                    if known_hash:
+                        handle_one(sp, known_hash)
+                        finish_one()
+                        return
+                    submit("hash", self._hash_source, sp)
+
+                def consume(fut: Future):
+                    sp = getattr(fut, "_src", None)
+                    try:
+                        v = fut.result()
+                    except Exception:
+                        v = ""
+                    if sp and v and getattr(fut, "_stage", "") == "fp":
+                        on_fingerprint(sp, v)
+                        return
+                    if sp and v:
+                        handle_one(sp, v)
+                    elif sp:
+                        # Unreadable: handle_one() never runs, drop its planned folder here
+                        planned.pop(sp.path, None)
+                    finish_one()
+
+                def handle_one(ent: SourceEntry, src_hash: str):
+                    # src_hash is empty when the file will be hashed while it is copied
+                    nonlocal res
+                    if self._stopped():
+                        return
+                    src_path = ent.path
+
+                    if self.profile.mode in (BackupMode.ARCHIVE_RULES, BackupMode.INCREMENTAL_RULES):
+                        if src_hash:
+                            self._upgrade_stale(ent.size)
+                        if src_hash and not self._reserve_hash(src_hash):
+                            planned.pop(src_path, None)
+                            with self._lock:
+                                res.skipped_duplicates += 1
+                            self._emit(f"[Skip duplicate] {src_path}")
+                            return
+                        folder = planned.pop(src_path, None)
+                        if folder is None:
+                            dest = rules.dest(self.target_root, src_path, ent.size)
+                        else:
+                            dest = rules.dest_in(self.target_root, folder, src_path)
+                    else:
+                        dest = self._mirror_dest(ent, mirror_base)
+                        with self._lock:
+                            self._mirror_keep.add(dest)
+
+                    if dest.exists() and self.profile.conflict == ConflictStrategy.SKIP:
+                        self._emit(f"[Skip exists] {src_path} -> {dest}")
+                        return
+
+                    if self.dry_run:
+                        dest_final = self._claim_dest(dest, src_hash)
+                        res.bytes_copied += ent.size
+                        res.copied += 1
+                        self._emit(f"[Would copy] {src_path} -> {dest_final}")
+                        return
+
+                    if mirror:
+                        # Mirror trees are created folder by folder as the walk reaches
+                        # them, here on the dispatcher, so copy threads only hit the cache.
+                        # A failure (e.g. a file still in the way of a new folder) only
+                        # fails this file; the mirror delete clears the way for next time.
+                        try:
+                            self._dirs.ensure(dest.parent)
+                        except Exception as e:
+                            with self._lock:
+                                res.failed += 1
+                            self._error(f"[Copy failed] {src_path}: {e}")
+                            return
+                    submit_copy(ent, dest, src_hash)
+
+                def submit_copy(ent: SourceEntry, dest: Path, src_hash: str):
+                    nonlocal copy_queued, copy_queued_bytes
+                    cost = min(ent.size, COPY_QUEUE_BYTES_PER_THREAD)
+                    with copy_cv:
+                        while copy_queued and (
+                            copy_queued >= max_copy_queued or copy_queued_bytes + cost > max_copy_queued_bytes
+                        ):
+                            if self._stopped():
+                                return
+                            copy_cv.wait(0.2)
+                        copy_queued += 1
+                        copy_queued_bytes += cost
+                    copy_pool.submit(run_copy, ent, dest, src_hash, cost)
+
+                def run_copy(ent: SourceEntry, dest: Path, src_hash: str, cost: int):
+                    nonlocal copy_queued, copy_queued_bytes
+                    try:
+                        do_copy(ent, dest, src_hash)
+                    finally:
+                        with copy_cv:
+                            copy_queued -= 1
+                            copy_queued_bytes -= cost
+                            copy_cv.notify()
+
+                def do_copy(ent: SourceEntry, dest: Path, src_hash: str):
+                    nonlocal res
+                    if self._stopped():
+                        return
+                    src_path = ent.path
+
+                    src_st = None
+                    fp = ""
+                    try:
+                        if ent.is_link and self.profile.symlinks != SymlinkMode.FOLLOW:
+                            if self.profile.symlinks == SymlinkMode.SKIP:
+                                return
+                            h = src_hash
+                            dest_final = self._claim_dest(dest, h)
+                            copy_symlink(src_path, dest_final, self._dirs)
+                        else:
+                            src_st = ent.st
+                            tmp, h, fp, method = stage_copy(
+                                src_path, dest, self._chunk_size(), src_hash,
+                                self._algo, self._mmap_min(), self.profile.perf.io_policy, self._dirs,
+                            )
+                            with self._lock:
+                                self._copy_methods[method] = self._copy_methods.get(method, 0) + 1
+                            if dedup and not src_hash and not self._reserve_hash(h):
+                                discard_staged(tmp)
+                                with self._lock:
+                                    res.skipped_duplicates += 1
+                                self._emit(f"[Skip duplicate] {src_path}")
+                                return
+                            dest_final = self._claim_dest(dest, h)
+                            try:
+                                commit_staged(src_path, tmp, dest_final, self.profile.preserve_metadata)
+                            except Exception:
+                                discard_staged(tmp)
+                                raise
+                    except Exception as e:
+                        with self._lock:
+                            res.failed += 1
+                        self._error(f"[Copy failed] {src_path}: {e}")
+                        return
+
+                    with self._lock:
+                        res.bytes_copied += ent.size
+                        res.copied += 1
+
+                    try:
+                        dst_st = dest_final.stat()
+                    except Exception:
+                        dst_st = None
+
+                    if dedup and dst_st is not None:
+                        assert self._db is not None
+                        try:
+                            # Not read back from the copy: streamed with it, or else the
+                            # source's (usually cached by the dedup gates)
+                            if not fp:
+                                if src_st is not None:
+                                    fp = self._fingerprint_source(src_path, src_st)
+                                else:
+                                    fp = fingerprint_file(dest_final)
+                            if self._src_cache is not None and src_st is not None:
+                                self._src_cache.put(src_st, digest=h, fp=fp, algo=self._algo)
+                            self._db.set(dest_final, dst_st.st_size, dst_st.st_mtime_ns, h, fp, self._algo)
+                        except Exception:
+                            pass
+
+                    if self.profile.mode == BackupMode.MIRROR_TREE and dest_final == dest and src_st is not None and dst_st is not None:
+                        self._record_mirror(dest_final, src_st, dst_st, h)
+
+                    with self._lock:
+                        self._known_hashes.add(h)
+
+                    self._emit(f"[Copied] {src_path} -> {dest_final}")
+
+                follow = should_follow_symlink(self.profile.symlinks)
+                marks: dict[str, float] = {}
+                for batch in scan_dirs(self.sources, follow, self.profile.perf.walker_threads, walk):
+                    if self._stopped():
+                        break
+                    # All files of a batch come from one folder under one source root
+                    root = batch[0].root
+                    if incremental and root not in marks:
+                        marks[root] = self._incremental_mark(root)
+                    mark = marks.get(root, 0.0)
+                    if dedup:
+                        # Rule folders for the whole source folder at once, for the files
+                        # that get past the incremental mark; handle_one() picks them up
+                        todo = [e for e in batch if not (mark and e.st.st_mtime <= mark)]
+                        planned.update(zip((e.path for e in todo), rules.folders_for_dir(todo)))
+
+                    for ent in batch:
+                        if self._stopped():
+                            break
+                        src = ent.path
+                        st = ent.st
+
+                        # Incremental: unchanged files are dropped here, before any read
+                        if mark and st.st_mtime <= mark:
+                            self._emit(f"[Skip incremental] {src}")
+                            finish_one()
+                            continue
+
+                        if mirror:
+                            dest = self._mirror_dest(ent, mirror_base)
+                            if self._mirror_unchanged(st, src, dest):
+                                with self._lock:
+                                    self._mirror_keep.add(dest)
+                                res.skipped_unchanged += 1
+                                self._emit(f"[Skip unchanged] {src}")
+                                finish_one()
+                                continue
+                            olds, verify = self._mirror_move_sources(st, dest)
+                            if olds:
+                                # Possibly renamed in the source: decided once the keep set is complete
+                                with self._lock:
+                                    self._mirror_keep.add(dest)
+                                move_candidates.append((ent, dest, olds, verify))
+                                finish_one()
+                                continue
+
+                        if self._needs_prehash(ent):
+                            submit("hash", self._hash_source, ent)
+                        elif not dedup:
+                            handle_one(ent, "")
+                            finish_one()
+                        else:
+                            size = ent.size
+                            cached = self._src_cache.get(st) if self._src_cache is not None else None
+                            if size not in self._known_sizes and size not in seen_sizes:
+                                seen_sizes.add(size)
+                                size_first[size] = ent
+                                handle_one(ent, "")
+                                finish_one()
+                            else:
+                                seen_sizes.add(size)
+                                first = size_first.pop(size, None)
+                                if first is not None:
+                                    # The first file of this size skipped the fingerprint,
+                                    # register it before this one is compared.
+                                    try:
+                                        register_fp(self._fingerprint_source(first.path, first.st), first)
+                                    except Exception:
+                                        pass
+                                if cached and cached.fp:
+                                    # Unchanged since a previous run: decide without reading it
+                                    on_fingerprint(ent, cached.fp, cached.digest if cached.algo == self._algo else "")
+                                else:
+                                    submit("fp", self._fingerprint_source, ent)
+
+                        while in_flight and (len(in_flight) >= max_in_flight or in_flight_bytes >= max_in_flight_bytes):
+                            if self._stopped():
+                                break
+                            reap()
+
+                # The walk is complete, from here on the total is exact
+                self._total = walk.files
+                res.total_sources = walk.files
+                res.skipped_missing_sources = walk.missing_roots
+
+                while in_flight and not self._stopped():
+                    reap()
+
+                # Rename/move detection: reuse an old mirror copy instead of copy + delete
+                used_olds: set[str] = set()
+                for ent, dest, olds, verify in move_candidates:
+                    if self._stopped():
+                        break
+                    if self._try_mirror_move(ent.path, ent.st, dest, olds, verify, used_olds):
+                        res.moved_mirror += 1
+                    else:
+                        handle_one(ent, "")
+
+                if dedup:
+                    self._emit(
+                        f"Dedup gates: {fingerprinted} fingerprinted, {prehashed} fully hashed "
+                        f"before copy, of {self._done} files."
+                    )
+
+            if self._copy_methods:
+                used = ", ".join(f"{k} {v}" for k, v in sorted(self._copy_methods.items(), key=lambda kv: -kv[1]))
+                self._emit(f"Copy methods: {used}")
+
+            if mirror and not self.dry_run:
+                self._save_mirror_manifest()
+
+            if self.profile.mode == BackupMode.MIRROR_TREE and not self._stopped():
+                if self.profile.mirror_delete_scope == MirrorDeleteScope.NO_DELETE:
+                    res.deleted_mirror = 0
+                else:
+                    if self.dry_run:
+                        res.deleted_mirror = self._mirror_count_deletions(
+                            mirror_base, self._mirror_keep | self._mirror_moved_from
+                        )
+                        self._emit(f"[Would delete] {res.deleted_mirror} files (mirror)")
+                    else:
+                        res.deleted_mirror = self._mirror_delete(mirror_base, self._mirror_keep)
+                        if res.deleted_mirror:
+                            self._emit(f"Deleted {res.deleted_mirror} files (mirror).")
+
+            if not self.dry_run and not self._stopped():
+                self.profile.last_run_utc = run_started
+                marks = dict(self.profile.last_run_by_root or {})
+                for raw in self.sources:
+                    if Path(raw).expanduser().exists():
+                        marks[self._root_key(raw)] = run_started
+                self.profile.last_run_by_root = marks
+
+            self._phase("done")
+            self._emit("Done.")
+
+        except Exception as e:
+            self._error(f"Unexpected error: {e}")
+        finally:
+            try:
+                self._close_db()
+            except Exception as e:
+                self._error(f"Unexpected error: {e}")
+        return res
+
+    def _mirror_count_deletions(self, base: Path, keep: set[Path]) -> int:
+        if not base.exists():
+            return 0
+        cnt = 0
+        for root, _, files in os.walk(base):
+            if self._stopped():
+                break
+            for name in files:
+                p = (Path(root) / name).resolve()
+                if p.name.startswith(self._db_path.name):
+                    continue
+                if p not in keep and self._delete_allowed(p):
+                    cnt += 1
+        return cnt
+
+    def _mirror_delete(self, base: Path, keep: set[Path]) -> int:
+        if not base.exists():
+            return 0
+        deleted = 0
+        for root, _, files in os.walk(base):
+            if self._stopped():
+                break
+            for name in files:
+                p = (Path(root) / name).resolve()
+                if p.name.startswith(self._db_path.name):
+                    continue
+                if p not in keep and self._delete_allowed(p):
+                    try:
+                        p.unlink()
+                        deleted += 1
+                    except Exception:
+                        pass
+        return deleted
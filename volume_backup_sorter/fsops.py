@@ -1,14 +1,45 @@
 from __future__ import annotations
 
+import errno
 import os
 import re
 import shutil
+import sys
+import threading
+import time
+import uuid
 import mimetypes
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
-from .models import ConflictStrategy, SymlinkMode
+from .models import ConflictStrategy, HashAlgo, IoPolicy, SymlinkMode
+from .hashing import digest_copy, digest_file
+from .iohints import WriteBehind, drop_cached, read_sequential
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+# Copy methods, fastest first; stage_copy() reports which one was used
+COPY_REFLINK = "reflink"
+COPY_FILE_RANGE = "copy_file_range"
+COPY_SENDFILE = "sendfile"
+COPY_BUFFERED = "buffered"
+
+# Linux FICLONE ioctl, _IOW(0x94, 9, int): the copy shares the source's extents
+# (btrfs, XFS with reflink=1, bcachefs, ...), nothing is read or written.
+_FICLONE = 0x40049409
+
+# errnos meaning "not available for this pair of files", not a real I/O error
+_UNSUPPORTED_ERRNOS = {
+    errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+    errno.ENOTTY, errno.EBADF, errno.ENOTSOCK, errno.EPERM,
+}
+# (method, src_dev, dst_dev) combinations that failed once are not tried again
+_unsupported: set[tuple[str, int, int]] = set()
 
 
 @dataclass(frozen=True)
@@ -39,6 +70,24 @@ def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
 
+class DirCache:
+    # Destination folders known to exist, shared by the copy threads of a run: each
+    # folder is created (or found) once instead of a mkdir per copied file. Folders
+    # removed by someone else during the run are not noticed.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._known: set[Path] = set()
+
+    def ensure(self, p: Path) -> None:
+        if p in self._known:
+            return
+        ensure_dir(p)
+        with self._lock:
+            self._known.add(p)
+            self._known.update(p.parents)
+
+
 def sanitize_folder_name(name: str) -> str:
     name = (name or "").strip()
     if not name:
@@ -66,7 +115,6 @@ def unique_dest_path(dest: Path, strategy: str, content_hash: str) -> Path:
             return cand
 
     if strategy == ConflictStrategy.RENAME_TIME:
-        import time
         ts = time.strftime("%Y%m%d_%H%M%S")
         cand = parent / f"{stem}_{ts}{suf}"
         if not cand.exists():
@@ -81,9 +129,137 @@ def unique_dest_path(dest: Path, strategy: str, content_hash: str) -> Path:
         i += 1
 
 
-def safe_copy_file(src: Path, dst: Path, preserve_metadata: bool) -> None:
+# Target filesystems compare names case-insensitively by default on these platforms
+# (NTFS, APFS/HFS+); elsewhere it is probed per device, for FAT/exFAT/NTFS mounts
+_CASE_INSENSITIVE_DEFAULT = sys.platform in ("win32", "darwin")
+
+
+class _DirNames:
+    def __init__(self, fold: bool):
+        self.fold = fold  # names are compared casefolded
+        self.listed = False
+        self.taken: set[str] = set()  # on disk when first listed, plus every name handed out
+        self.claimed: set[str] = set()  # handed out in this run
+        self.next_counter: dict[tuple[str, str], int] = {}
+
+    def key(self, name: str) -> str:
+        return name.casefold() if self.fold else name
+
+
+class DestNameRegistry:
+    # Conflict resolution for many files landing in the same folders, shared by all
+    # copy threads of a run. Each destination folder is listed once with scandir; after
+    # that a free name costs set lookups plus one stat of the chosen name (which also
+    # catches files created meanwhile). Counters resume per (stem, suffix) instead of
+    # probing _1, _2, ... again, so 5000 IMG_0001.jpg cost O(n) in total. Results match
+    # unique_dest_path(), with names handed out earlier in the run counting as taken,
+    # even for OVERWRITE and SKIP. On case-insensitive targets IMG.JPG and img.jpg are
+    # the same name.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirs: dict[Path, _DirNames] = {}
+        self._fold_by_dev: dict[int, bool] = {}
+
+    def _folds_case(self, parent: Path) -> bool:
+        try:
+            dev = os.stat(parent).st_dev
+        except OSError:
+            return _CASE_INSENSITIVE_DEFAULT
+        fold = self._fold_by_dev.get(dev)
+        if fold is None:
+            fold = _CASE_INSENSITIVE_DEFAULT
+            # The nearest folder whose name has letters tells: is it found under the
+            # swapped-case name too?
+            for p in (parent, *parent.parents):
+                alt = p.name.swapcase()
+                if alt == p.name:
+                    continue
+                try:
+                    if os.stat(p).st_dev != dev:
+                        break
+                    fold = os.path.samefile(p, p.parent / alt)
+                except OSError:
+                    fold = False
+                break
+            self._fold_by_dev[dev] = fold
+        return fold
+
+    def _names(self, parent: Path, listing: bool) -> _DirNames:
+        d = self._dirs.get(parent)
+        if d is None:
+            d = self._dirs[parent] = _DirNames(self._folds_case(parent))
+        if listing and not d.listed:
+            d.listed = True
+            try:
+                with os.scandir(parent) as it:
+                    d.taken.update(d.key(e.name) for e in it)
+            except OSError:
+                pass
+        return d
+
+    @staticmethod
+    def _free(d: _DirNames, parent: Path, name: str) -> bool:
+        key = d.key(name)
+        if key in d.taken:
+            return False
+        if os.path.lexists(parent / name):
+            d.taken.add(key)
+            return False
+        return True
+
+    def claim(self, dest: Path, strategy: str, content_hash: str) -> Path:
+        parent = dest.parent
+        # OVERWRITE and SKIP (always the case in mirror mode) only look at names handed
+        # out in this run, the folder listing is not needed for them
+        listing = strategy not in (ConflictStrategy.OVERWRITE, ConflictStrategy.SKIP)
+        with self._lock:
+            d = self._names(parent, listing)
+            name = self._pick(d, dest, strategy, content_hash)
+            d.taken.add(d.key(name))
+            d.claimed.add(d.key(name))
+        return parent / name
+
+    def _pick(self, d: _DirNames, dest: Path, strategy: str, content_hash: str) -> str:
+        parent = dest.parent
+        if strategy in (ConflictStrategy.OVERWRITE, ConflictStrategy.SKIP):
+            if d.key(dest.name) not in d.claimed:
+                return dest.name
+        elif self._free(d, parent, dest.name):
+            return dest.name
+
+        stem = dest.stem
+        suf = dest.suffix
+
+        if strategy == ConflictStrategy.RENAME_HASH:
+            cand = f"{stem}_{content_hash[:12]}{suf}"
+            if self._free(d, parent, cand):
+                return cand
+
+        if strategy == ConflictStrategy.RENAME_TIME:
+            cand = f"{stem}_{time.strftime('%Y%m%d_%H%M%S')}{suf}"
+            if self._free(d, parent, cand):
+                return cand
+
+        # Counter: every number below next_counter is known to be taken
+        counter_key = (d.key(stem), d.key(suf))
+        i = d.next_counter.get(counter_key, 1)
+        while not self._free(d, parent, f"{stem}_{i}{suf}"):
+            i += 1
+        d.next_counter[counter_key] = i + 1
+        return f"{stem}_{i}{suf}"
+
+
+def _ensure_parent(dst: Path, dirs: DirCache | None) -> None:
+    if dirs is None:
+        ensure_dir(dst.parent)
+    else:
+        dirs.ensure(dst.parent)
+
+
+def safe_copy_file(src: Path, dst: Path, preserve_metadata: bool, dirs: DirCache | None = None) -> None:
     # Copy via temp file and atomic replace to be crash-safe
-    ensure_dir(dst.parent)
+    _ensure_parent(dst, dirs)
     tmp = dst.with_name(dst.name + ".partial")
 
     if tmp.exists():
@@ -93,8 +269,150 @@ def safe_copy_file(src: Path, dst: Path, preserve_metadata: bool) -> None:
             pass
 
     with src.open("rb") as fsrc, tmp.open("wb") as fdst:
-        shutil.copyfileobj(fsrc, fdst, length=1024 * 1024)
+        copy_data(fsrc, fdst, 1024 * 1024)
+
+    commit_staged(src, tmp, dst, preserve_metadata)
+
+
+def _try_reflink(fsrc, fdst) -> bool:
+    if fcntl is None:
+        return False
+    key = (COPY_REFLINK, os.fstat(fsrc.fileno()).st_dev, os.fstat(fdst.fileno()).st_dev)
+    if key in _unsupported:
+        return False
+    try:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        return True
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED_ERRNOS:
+            raise
+        _unsupported.add(key)
+        return False
+
+
+def _kernel_copy(fsrc, fdst, chunk_size: int, wb: WriteBehind | None = None) -> str:
+    # copy_file_range, then sendfile: the data never passes through Python buffers.
+    # Both copy until EOF like the buffered loop. Returns "" if neither is usable.
+    fin, fout = fsrc.fileno(), fdst.fileno()
+    src_st = os.fstat(fin)
+    devs = (src_st.st_dev, os.fstat(fout).st_dev)
+
+    def _range(off: int) -> int:
+        return os.copy_file_range(fin, fout, chunk_size, off, off)
+
+    def _sendfile(off: int) -> int:
+        return os.sendfile(fout, fin, off, chunk_size)
+
+    for name, fn, ok in (
+        (COPY_FILE_RANGE, _range, hasattr(os, "copy_file_range")),
+        (COPY_SENDFILE, _sendfile, hasattr(os, "sendfile")),
+    ):
+        if not ok or (name, *devs) in _unsupported:
+            continue
+        off = 0
+        try:
+            while True:
+                n = fn(off)
+                if not n:
+                    break
+                off += n
+                if wb is not None:
+                    wb.wrote(n)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            _unsupported.add((name, *devs))
+            off = -1
+        # Some filesystems return 0 right away instead of failing (as shutil notes for
+        # copy_file_range), and the caller trusts the copy to match a known digest:
+        # anything short of the full size is redone with the next method
+        if off == src_st.st_size:
+            return name
+        os.ftruncate(fout, 0)
+        os.lseek(fout, 0, os.SEEK_SET)
+        if wb is not None:
+            wb.rewind()
+    return ""
+
 
+def copy_data(fsrc, fdst, chunk_size: int, wb: WriteBehind | None = None) -> str:
+    # Copy an open file (no hashing) with the fastest available method
+    if _try_reflink(fsrc, fdst):
+        return COPY_REFLINK
+    method = _kernel_copy(fsrc, fdst, chunk_size, wb)
+    if method:
+        return method
+    fsrc.seek(0)
+    if wb is None:
+        shutil.copyfileobj(fsrc, fdst, length=chunk_size)
+    else:
+        while True:
+            b = fsrc.read(chunk_size)
+            if not b:
+                break
+            fdst.write(b)
+            wb.wrote(len(b))
+    return COPY_BUFFERED
+
+
+# stage_copy() temp files: .<name>.vbs-<8 hex digits>.partial. The marker keeps
+# them apart from source files that merely end in .partial, which get backed up
+_STAGED_RE = re.compile(r"^\..+\.vbs-[0-9a-f]{8}\.partial$")
+
+
+def is_staged_name(name: str) -> bool:
+    return _STAGED_RE.search(name) is not None
+
+
+def stage_copy(
+    src: Path,
+    dst: Path,
+    chunk_size: int,
+    src_hash: str = "",
+    algo: str = HashAlgo.SHA256,
+    mmap_min: int = 0,
+    io_policy: str = IoPolicy.DEFAULT,
+    dirs: DirCache | None = None,
+) -> tuple[Path, str, str, str]:
+    # Copy src into a uniquely named hidden .partial next to dst; returns
+    # (tmp, digest, fingerprint, method). src_hash, when given, must already be an
+    # `algo` digest. The fingerprint only comes for free with the buffered pass, it is
+    # "" for the other methods (take it from the source, e.g. a cached one).
+    # The caller decides afterwards whether to commit_staged() or discard_staged().
+    #   - reflink when possible: no data is copied, the hash (if not known yet) costs
+    #     one read of the source, same as hashing while copying
+    #   - hash already known: copy_file_range / sendfile, no userspace buffers
+    #   - otherwise a single buffered pass that hashes what it writes
+    _ensure_parent(dst, dirs)
+    tmp = dst.with_name(f".{dst.name}.vbs-{uuid.uuid4().hex[:8]}.partial")
+    try:
+        with src.open("rb") as fsrc, tmp.open("wb") as fdst:
+            read_sequential(fsrc.fileno(), io_policy)
+            wb = WriteBehind(fdst.fileno(), io_policy)
+            if _try_reflink(fsrc, fdst):
+                method = COPY_REFLINK
+                h = src_hash or digest_file(src, chunk_size, algo, mmap_min, io_policy)
+                fp = ""
+            elif src_hash:
+                method = copy_data(fsrc, fdst, chunk_size, wb)
+                h = src_hash
+                fp = ""
+            else:
+                method = COPY_BUFFERED
+                h, fp = digest_copy(fsrc, fdst, chunk_size, algo, wb)
+            # Neither file is read again in this run. Dirty pages of the copy cannot be
+            # dropped, so without write-behind only what the kernel has flushed goes.
+            fdst.flush()
+            wb.finish()
+            drop_cached(fsrc.fileno(), io_policy)
+            drop_cached(fdst.fileno(), io_policy)
+    except BaseException:
+        discard_staged(tmp)
+        raise
+    return tmp, h, fp, method
+
+
+def commit_staged(src: Path, tmp: Path, dst: Path, preserve_metadata: bool) -> None:
     if preserve_metadata:
         try:
             shutil.copystat(src, tmp, follow_symlinks=True)
@@ -104,9 +422,16 @@ def safe_copy_file(src: Path, dst: Path, preserve_metadata: bool) -> None:
     os.replace(tmp, dst)
 
 
-def copy_symlink(src: Path, dst: Path) -> None:
+def discard_staged(tmp: Path) -> None:
+    try:
+        tmp.unlink()
+    except Exception:
+        pass
+
+
+def copy_symlink(src: Path, dst: Path, dirs: DirCache | None = None) -> None:
     # Recreate symlink if allowed
-    ensure_dir(dst.parent)
+    _ensure_parent(dst, dirs)
     if dst.exists():
         dst.unlink()
     target = os.readlink(src)
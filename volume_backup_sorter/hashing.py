@@ -1,17 +1,145 @@
 from __future__ import annotations
 
+import os
+import mmap
 import hashlib
+import threading
 from pathlib import Path
+from typing import BinaryIO
+
+from .models import HashAlgo, IoPolicy
+from .iohints import WriteBehind, drop_cached, read_sequential
+
+
+# Bytes read from each end of a file for the partial fingerprint
+FINGERPRINT_BYTES = 64 * 1024
+# Smallest read request; files below this are read in one call
+MIN_READ_BYTES = 64 * 1024
+
+# One read buffer per thread, grown on demand and reused for every file that thread
+# hashes or copies, so the hot loop allocates nothing
+_tls = threading.local()
+
+
+def _read_buffer(size: int, chunk_size: int) -> memoryview:
+    # Read size follows the file: small files get a buffer just big enough, large ones
+    # the configured chunk. A thread that only sees small files never grows to chunk_size.
+    n = max(MIN_READ_BYTES, min(chunk_size, size + 1))
+    view = getattr(_tls, "view", None)
+    if view is None or len(view) < n:
+        view = memoryview(bytearray(n))
+        _tls.view = view
+    return view[:n]
+
+
+def new_hasher(algo: str = HashAlgo.SHA256):
+    # BLAKE2b is cut to 32 bytes so digests keep the SHA-256 size in the index
+    # and in hash-based file names
+    if algo == HashAlgo.BLAKE2B:
+        return hashlib.blake2b(digest_size=32)
+    if algo == HashAlgo.SHA256:
+        return hashlib.sha256()
+    raise ValueError(f"Unknown hash algorithm: {algo}")
+
+
+def digest_file(
+    path: Path, chunk_size: int, algo: str = HashAlgo.SHA256, mmap_min: int = 0, io_policy: str = IoPolicy.DEFAULT
+) -> str:
+    # Files of at least mmap_min bytes (0 = never) are hashed straight from a read-only
+    # mapping: no read() copies at all, the page cache is the buffer.
+    h = new_hasher(algo)
+    with path.open("rb", buffering=0) as f:
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        read_sequential(fd, io_policy)
+        try:
+            if mmap_min and size >= mmap_min:
+                try:
+                    with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+                        for off in range(0, size, chunk_size):
+                            h.update(mv[off:off + chunk_size])
+                    return h.hexdigest()
+                except (OSError, ValueError):
+                    # Not mappable (some network and FUSE filesystems): fall back to reads
+                    h = new_hasher(algo)
+                    f.seek(0)
+            view = _read_buffer(size, chunk_size)
+            while True:
+                n = f.readinto(view)
+                if not n:
+                    break
+                h.update(view[:n])
+        finally:
+            drop_cached(fd, io_policy)
+    return h.hexdigest()
+
+
+def digest_copy(
+    fsrc: BinaryIO, fdst: BinaryIO, chunk_size: int, algo: str = HashAlgo.SHA256, wb: WriteBehind | None = None
+) -> tuple[str, str]:
+    # Single pass: every chunk read from fsrc goes to the hasher and to fdst. Returns
+    # (digest, fingerprint); the fingerprint is taken from the same chunks, so the copy
+    # is never read back for it.
+    h = new_hasher(algo)
+    fp = _FingerprintTap()
+    view = _read_buffer(os.fstat(fsrc.fileno()).st_size, chunk_size)
+    while True:
+        n = fsrc.readinto(view)
+        if not n:
+            break
+        h.update(view[:n])
+        fp.update(view[:n])
+        fdst.write(view[:n])
+        if wb is not None:
+            wb.wrote(n)
+    return h.hexdigest(), fp.hexdigest()
 
 
 def sha256_file(path: Path, chunk_size: int) -> str:
-    # Read in chunks to keep memory low
+    return digest_file(path, chunk_size, HashAlgo.SHA256)
+
+
+def _fingerprint(size: int, head: bytes, tail: bytes) -> str:
     h = hashlib.sha256()
-    with path.open("rb") as f:
-        while True:
-            b = f.read(chunk_size)
-            if not b:
-                break
-            h.update(b)
+    h.update(size.to_bytes(8, "little"))
+    h.update(head)
+    h.update(tail)
     return h.hexdigest()
 
+
+def fingerprint_file(path: Path) -> str:
+    # Size + first and last 64 KiB. Cheap pre-filter: equal files always share it,
+    # different files of the same size almost never do. Always SHA-256, independent
+    # of the profile's content digest, so stored fingerprints stay comparable.
+    with path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        head = f.read(FINGERPRINT_BYTES)
+        tail = b""
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            tail = f.read(FINGERPRINT_BYTES)
+    return _fingerprint(size, head, tail)
+
+
+class _FingerprintTap:
+    # fingerprint_file() of the bytes streaming through a copy: keeps the head and a
+    # rolling tail, so the result matches what was actually written
+
+    def __init__(self):
+        self.size = 0
+        self.head = bytearray()
+        self.tail = b""
+
+    def update(self, data: memoryview) -> None:
+        if len(self.head) < FINGERPRINT_BYTES:
+            self.head += data[:FINGERPRINT_BYTES - len(self.head)]
+        if len(data) >= FINGERPRINT_BYTES:
+            self.tail = bytes(data[-FINGERPRINT_BYTES:])
+        else:
+            self.tail = (self.tail + bytes(data))[-FINGERPRINT_BYTES:]
+        self.size += len(data)
+
+    def hexdigest(self) -> str:
+        # The tail starts after the head, as with the seek in fingerprint_file()
+        n = min(FINGERPRINT_BYTES, self.size - FINGERPRINT_BYTES)
+        return _fingerprint(self.size, bytes(self.head), self.tail[len(self.tail) - n:] if n > 0 else b"")
@@ -75,6 +75,7 @@ _STRINGS = {
         "settings.mirror_scope": "Mirror delete scope:",
         "settings.mirror_subdir": "Mirror subfolder:",
         "settings.mirror_whitelist": "Delete whitelist (extensions):",
+        "settings.mirror_checksum": "Mirror: compare checksums of unchanged-looking files",
 
         "mirror.scope.subfolder": "Only inside a subfolder (safe)",
         "mirror.scope.whole": "Whole target (dangerous)",
@@ -130,11 +131,22 @@ _STRINGS = {
         "perf.hash_threads": "Hash threads:",
         "perf.copy_threads": "Copy threads:",
         "perf.chunk_mb": "Hash chunk (MB):",
+        "perf.walker_threads": "Scan threads:",
+        "perf.hash_algo": "Hash algorithm:",
+        "perf.mmap_min_mb": "Memory-map files from (MB, 0 = off):",
+        "perf.io_policy": "Page cache:",
+        "io.default": "Default",
+        "io.nocache": "Don't keep backup data cached",
+        "io.write_behind": "Don't keep cached + write-behind",
+        "hash.sha256": "SHA-256",
+        "hash.blake2b": "BLAKE2b",
 
         "preview.dialog.title": "Preview summary",
         "preview.files_total": "Total source files:",
         "preview.copy": "Would copy:",
         "preview.skip_dup": "Would skip duplicates:",
+        "preview.skip_unchanged": "Unchanged (mirror):",
+        "preview.move_mirror": "Would move (mirror):",
         "preview.skip_missing": "Missing sources:",
         "preview.delete_mirror": "Would delete (mirror):",
         "preview.bytes": "Estimated bytes to copy:",
@@ -195,6 +207,7 @@ _STRINGS = {
         "settings.mirror_scope": "Mirror-Löschbereich:",
         "settings.mirror_subdir": "Mirror-Unterordner:",
         "settings.mirror_whitelist": "Delete-Whitelist (Extensions):",
+        "settings.mirror_checksum": "Mirror: Prüfsummen unverändert wirkender Dateien vergleichen",
 
         "mirror.scope.subfolder": "Nur in Unterordner (sicher)",
         "mirror.scope.whole": "Ganzes Ziel (gefährlich)",
@@ -250,11 +263,22 @@ _STRINGS = {
         "perf.hash_threads": "Hash-Threads:",
         "perf.copy_threads": "Copy-Threads:",
         "perf.chunk_mb": "Hash-Chunk (MB):",
+        "perf.walker_threads": "Scan-Threads:",
+        "perf.hash_algo": "Hash-Algorithmus:",
+        "perf.mmap_min_mb": "Dateien mappen ab (MB, 0 = aus):",
+        "perf.io_policy": "Page-Cache:",
+        "io.default": "Standard",
+        "io.nocache": "Backup-Daten nicht cachen",
+        "io.write_behind": "Nicht cachen + Write-behind",
+        "hash.sha256": "SHA-256",
+        "hash.blake2b": "BLAKE2b",
 
         "preview.dialog.title": "Vorschau",
         "preview.files_total": "Quellen-Dateien gesamt:",
         "preview.copy": "Würde kopieren:",
         "preview.skip_dup": "Würde Dubletten skippen:",
+        "preview.skip_unchanged": "Unverändert (Mirror):",
+        "preview.move_mirror": "Würde verschieben (Mirror):",
         "preview.skip_missing": "Fehlende Quellen:",
         "preview.delete_mirror": "Würde löschen (Mirror):",
         "preview.bytes": "Geschätzte Bytes zum Kopieren:",
@@ -315,6 +339,7 @@ _STRINGS = {
         "settings.mirror_scope": "Alcance de borrado (mirror):",
         "settings.mirror_subdir": "Subcarpeta mirror:",
         "settings.mirror_whitelist": "Whitelist de borrado (extensiones):",
+        "settings.mirror_checksum": "Espejo: comparar sumas de archivos aparentemente sin cambios",
 
         "mirror.scope.subfolder": "Solo dentro de subcarpeta (seguro)",
         "mirror.scope.whole": "Todo el destino (peligroso)",
@@ -370,11 +395,22 @@ _STRINGS = {
         "perf.hash_threads": "Hilos hash:",
         "perf.copy_threads": "Hilos copia:",
         "perf.chunk_mb": "Chunk hash (MB):",
+        "perf.walker_threads": "Hilos de escaneo:",
+        "perf.hash_algo": "Algoritmo de hash:",
+        "perf.mmap_min_mb": "Mapear archivos desde (MB, 0 = no):",
+        "perf.io_policy": "Caché de páginas:",
+        "io.default": "Predeterminado",
+        "io.nocache": "No mantener datos de copia en caché",
+        "io.write_behind": "No mantener en caché + write-behind",
+        "hash.sha256": "SHA-256",
+        "hash.blake2b": "BLAKE2b",
 
         "preview.dialog.title": "Resumen",
         "preview.files_total": "Archivos totales:",
         "preview.copy": "Copiaría:",
         "preview.skip_dup": "Saltar duplicados:",
+        "preview.skip_unchanged": "Sin cambios (mirror):",
+        "preview.move_mirror": "Movería (mirror):",
         "preview.skip_missing": "Fuentes faltantes:",
         "preview.delete_mirror": "Borraría (mirror):",
         "preview.bytes": "Bytes estimados:",
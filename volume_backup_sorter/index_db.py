@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import itertools
+import os
+import queue
 import sqlite3
+import threading
+import time
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -8,15 +13,103 @@ from pathlib import Path
 @dataclass(frozen=True)
 class DbRecord:
     size: int
-    mtime: float
-    sha256: str
+    mtime_ns: int
+    digest: str
+    fp: str = ""
+    algo: str = "sha256"
+
+
+@dataclass(frozen=True)
+class MirrorRecord:
+    # Source stat at copy time and destination stat right after the copy
+    src_size: int
+    src_mtime_ns: int
+    dest_size: int
+    dest_mtime_ns: int
+    digest: str = ""
+    src_dev: int = 0
+    src_ino: int = 0
+    algo: str = "sha256"
+
+
+_STOP = object()
+
+# Schema version stored in PRAGMA user_version. Version 0 is the original layout
+# (absolute paths, hex digests, float mtime); see IndexDB._migrate_to_v1.
+SCHEMA_VERSION = 3
+
+_SQL_CREATE_FILES = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        path     TEXT PRIMARY KEY,
+        size     INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        digest   BLOB NOT NULL,
+        fp       BLOB NOT NULL,
+        algo     TEXT NOT NULL DEFAULT 'sha256'
+    ) WITHOUT ROWID
+"""
+_SQL_CREATE_MIRROR = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        path          TEXT PRIMARY KEY,
+        src_size      INTEGER NOT NULL,
+        src_mtime_ns  INTEGER NOT NULL,
+        dest_size     INTEGER NOT NULL,
+        dest_mtime_ns INTEGER NOT NULL,
+        digest        BLOB NOT NULL,
+        src_dev       INTEGER NOT NULL DEFAULT 0,
+        src_ino       INTEGER NOT NULL DEFAULT 0,
+        algo          TEXT NOT NULL DEFAULT 'sha256'
+    ) WITHOUT ROWID
+"""
+_SQL_SET_FILE = "INSERT OR REPLACE INTO files(path, size, mtime_ns, digest, fp, algo) VALUES (?, ?, ?, ?, ?, ?)"
+_SQL_DEL_FILE = "DELETE FROM files WHERE path = ?"
+_SQL_SET_MIRROR = (
+    "INSERT OR REPLACE INTO mirror(path, src_size, src_mtime_ns, dest_size, dest_mtime_ns, digest, src_dev, src_ino, algo) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_SQL_DEL_MIRROR = "DELETE FROM mirror WHERE path = ?"
+_SQL_SET_DIR = "INSERT OR REPLACE INTO dirs(path, mtime_ns, entries) VALUES (?, ?, ?)"
+_SQL_DEL_DIR = "DELETE FROM dirs WHERE path = ?"
 
 
 class IndexDB:
-    def __init__(self, db_path: Path):
+    # Reads are served from a snapshot loaded on open(); every write is queued to a
+    # single writer thread with its own connection, which commits in batches. Any
+    # thread (hash/copy pools included) may call get()/set().
+    #
+    # Callers use absolute paths; on disk paths are stored relative to the target
+    # root (with "/" separators) so the cache survives the drive mounting elsewhere.
+
+    BATCH_ROWS = 1000
+    BATCH_SECONDS = 1.0
+
+    def __init__(self, db_path: Path, root: Path | None = None):
         self.db_path = db_path
+        self.root = root if root is not None else db_path.parent
         self.conn: sqlite3.Connection | None = None
-        self._pending = 0
+        self.writer_error: Exception | None = None
+
+        self._prefix = os.path.join(str(self.root), "")
+        self._root_str = str(self.root)
+        self._rows: dict[str, tuple[int, int, str, str, str]] = {}
+        self._dirs: dict[str, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: threading.Thread | None = None
+
+    def _rel(self, path: Path | str) -> str | None:
+        s = str(path)
+        if s == self._root_str:
+            return ""
+        if not s.startswith(self._prefix):
+            return None
+        rel = s[len(self._prefix):]
+        return rel.replace(os.sep, "/") if os.sep != "/" else rel
+
+    def _abs(self, rel: str) -> str:
+        if not rel:
+            return self._root_str
+        return self._prefix + (rel.replace("/", os.sep) if os.sep != "/" else rel)
 
     def open(self) -> None:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
@@ -28,61 +121,247 @@ class IndexDB:
         cur.execute("PRAGMA synchronous=NORMAL;")
         cur.execute("PRAGMA temp_store=MEMORY;")
 
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS files (
-                path   TEXT PRIMARY KEY,
-                size   INTEGER NOT NULL,
-                mtime  REAL NOT NULL,
-                sha256 TEXT NOT NULL
+        version = int(cur.execute("PRAGMA user_version").fetchone()[0])
+        if version < SCHEMA_VERSION:
+            self._migrate(version)
+
+        # One streaming pass over the table; rows are kept as plain tuples
+        # (size, mtime_ns, digest, fp, algo), DbRecord objects are only built on get()
+        self._rows = {
+            self._abs(path): (size, mtime_ns, digest.hex(), fp.hex(), algo)
+            for path, size, mtime_ns, digest, fp, algo in cur.execute(
+                "SELECT path, size, mtime_ns, digest, fp, algo FROM files"
             )
+        }
+        self._dirs = {
+            self._abs(path): (mtime_ns, entries)
+            for path, mtime_ns, entries in cur.execute("SELECT path, mtime_ns, entries FROM dirs")
+        }
+
+        self._writer = threading.Thread(target=self._writer_loop, name="vbs-index-writer", daemon=True)
+        self._writer.start()
+
+    def _migrate(self, version: int) -> None:
+        # Each step upgrades from the previous version inside one transaction
+        assert self.conn is not None
+        steps = (self._migrate_to_v1, self._migrate_to_v2, self._migrate_to_v3)
+        for target, step in enumerate(steps, start=1):
+            if version >= target:
+                continue
+            self.conn.execute("BEGIN")
+            try:
+                step()
+                self.conn.execute(f"PRAGMA user_version = {target}")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            version = target
+        try:
+            self.conn.execute("VACUUM")
+        except Exception:
+            pass
+
+    def _migrate_to_v1(self) -> None:
+        # v0 -> v1: target-relative paths, BLOB digests, integer mtime_ns, algo column.
+        # Old rows only carried a float mtime; a row is kept (with the exact mtime_ns)
+        # when the file still matches it, so existing hashes are not recomputed.
+        assert self.conn is not None
+        conn = self.conn
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+        conn.execute(_SQL_CREATE_FILES.format(name="files_v1"))
+        if "files" in tables:
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(files)")}
+            fp_col = "fp" if "fp" in cols else "''"
+            rows = []
+            for path, size, mtime, sha, fp in conn.execute(f"SELECT path, size, mtime, sha256, {fp_col} FROM files"):
+                rel = self._rel(path)
+                try:
+                    st = os.stat(path)
+                    if rel is None or st.st_size != size or st.st_mtime != mtime:
+                        continue
+                    rows.append((rel, size, st.st_mtime_ns, bytes.fromhex(sha), bytes.fromhex(fp or ""), "sha256"))
+                except Exception:
+                    continue
+            conn.executemany(_SQL_SET_FILE.replace("files(", "files_v1("), rows)
+            conn.execute("DROP TABLE files")
+        conn.execute("DROP INDEX IF EXISTS idx_files_sha256")
+        conn.execute("ALTER TABLE files_v1 RENAME TO files")
+
+        conn.execute(_SQL_CREATE_MIRROR.format(name="mirror_v1"))
+        if "mirror" in tables:
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(mirror)")}
+            ident = "src_dev, src_ino" if "src_ino" in cols else "0, 0"
+            rows = []
+            for r in conn.execute(
+                f"SELECT path, src_size, src_mtime_ns, dest_size, dest_mtime_ns, sha256, {ident} FROM mirror"
+            ):
+                rel = self._rel(r[0])
+                try:
+                    if rel is not None:
+                        rows.append((rel, *r[1:5], bytes.fromhex(r[5] or ""), *r[6:], "sha256"))
+                except Exception:
+                    continue
+            conn.executemany(_SQL_SET_MIRROR.replace("mirror(", "mirror_v1("), rows)
+            conn.execute("DROP TABLE mirror")
+        conn.execute("ALTER TABLE mirror_v1 RENAME TO mirror")
+
+    def _migrate_to_v2(self) -> None:
+        # v1 -> v2: per-directory mtime and entry count, lets indexing skip unchanged folders
+        assert self.conn is not None
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dirs (
+                path     TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                entries  INTEGER NOT NULL
+            ) WITHOUT ROWID
             """
         )
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256)")
-        self.conn.commit()
+
+    def _migrate_to_v3(self) -> None:
+        # v2 -> v3: digest algorithm per mirror row; existing rows were all SHA-256
+        assert self.conn is not None
+        cols = {r[1] for r in self.conn.execute("PRAGMA table_info(mirror)")}
+        if "algo" not in cols:
+            self.conn.execute("ALTER TABLE mirror ADD COLUMN algo TEXT NOT NULL DEFAULT 'sha256'")
 
     def close(self) -> None:
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
         if not self.conn:
             return
-        try:
-            self.conn.commit()
-        except Exception:
-            pass
         self.conn.close()
         self.conn = None
 
-    def get(self, path: Path) -> DbRecord | None:
-        assert self.conn is not None
-        cur = self.conn.cursor()
-        cur.execute("SELECT size, mtime, sha256 FROM files WHERE path = ?", (str(path),))
-        row = cur.fetchone()
-        if not row:
-            return None
-        return DbRecord(int(row[0]), float(row[1]), str(row[2]))
+    def _writer_loop(self) -> None:
+        conn = sqlite3.connect(str(self.db_path))
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        batch: list[tuple[str, tuple]] = []
+        deadline = 0.0
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic()) if batch else None
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is not None and item is not _STOP:
+                    if not batch:
+                        deadline = time.monotonic() + self.BATCH_SECONDS
+                    batch.append(item)
+                    if len(batch) < self.BATCH_ROWS:
+                        continue
+
+                if batch:
+                    try:
+                        self._write_batch(conn, batch)
+                    except Exception as e:
+                        self.writer_error = e
+                    batch = []
+                if item is _STOP:
+                    break
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _write_batch(conn: sqlite3.Connection, batch: list[tuple[str, tuple]]) -> None:
+        # Consecutive statements of one kind go through a single executemany, order is kept
+        with conn:
+            for sql, group in itertools.groupby(batch, key=lambda x: x[0]):
+                conn.executemany(sql, [params for _, params in group])
 
-    def set(self, path: Path, size: int, mtime: float, sha256: str) -> None:
+    def count(self) -> int:
+        return len(self._rows)
+
+    def get(self, path: Path | str) -> DbRecord | None:
+        with self._lock:
+            row = self._rows.get(str(path))
+        return DbRecord(*row) if row else None
+
+    def set(
+        self, path: Path | str, size: int, mtime_ns: int, digest: str, fp: str = "", algo: str = "sha256"
+    ) -> None:
+        key = str(path)
+        row = (int(size), int(mtime_ns), str(digest), str(fp), str(algo))
+        with self._lock:
+            self._rows[key] = row
+        rel = self._rel(key)
+        if rel is not None:
+            self._queue.put((_SQL_SET_FILE, (rel, row[0], row[1], bytes.fromhex(row[2]), bytes.fromhex(row[3]), row[4])))
+
+    def cleanup_missing(self, seen: set[str], seen_dirs: set[str] | None = None) -> int:
+        # Remove rows for files (and directories) the index pass did not see
+        with self._lock:
+            to_delete = [p for p in self._rows if p not in seen]
+            for p in to_delete:
+                del self._rows[p]
+            dirs_gone = [d for d in self._dirs if d not in seen_dirs] if seen_dirs is not None else []
+            for d in dirs_gone:
+                del self._dirs[d]
+        for sql, paths in ((_SQL_DEL_FILE, to_delete), (_SQL_DEL_DIR, dirs_gone)):
+            for p in paths:
+                rel = self._rel(p)
+                if rel is not None:
+                    self._queue.put((sql, (rel,)))
+        return len(to_delete)
+
+    def get_dir(self, path: Path | str) -> tuple[int, int] | None:
+        # (mtime_ns, entries) as recorded when the directory was last listed
+        with self._lock:
+            return self._dirs.get(str(path))
+
+    def set_dir(self, path: Path | str, mtime_ns: int, entries: int) -> None:
+        key = str(path)
+        with self._lock:
+            self._dirs[key] = (int(mtime_ns), int(entries))
+        rel = self._rel(key)
+        if rel is not None:
+            self._queue.put((_SQL_SET_DIR, (rel, int(mtime_ns), int(entries))))
+
+    def children(self) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+        # Cached files and subdirectories grouped by parent directory
+        files: dict[str, list[str]] = {}
+        dirs: dict[str, list[str]] = {}
+        with self._lock:
+            for p in self._rows:
+                files.setdefault(os.path.dirname(p), []).append(p)
+            for d in self._dirs:
+                if d != self._root_str:
+                    dirs.setdefault(os.path.dirname(d), []).append(d)
+        return files, dirs
+
+    def load_mirror(self) -> dict[str, MirrorRecord]:
         assert self.conn is not None
         cur = self.conn.cursor()
         cur.execute(
-            "INSERT OR REPLACE INTO files(path, size, mtime, sha256) VALUES (?, ?, ?, ?)",
-            (str(path), int(size), float(mtime), str(sha256)),
+            "SELECT path, src_size, src_mtime_ns, dest_size, dest_mtime_ns, digest, src_dev, src_ino, algo FROM mirror"
         )
-        self._pending += 1
-        if self._pending >= 200:
-            self.conn.commit()
-            self._pending = 0
+        return {
+            self._abs(r[0]): MirrorRecord(
+                int(r[1]), int(r[2]), int(r[3]), int(r[4]), r[5].hex(), int(r[6]), int(r[7]), str(r[8])
+            )
+            for r in cur.fetchall()
+        }
 
-    def cleanup_missing(self, existing_paths: set[Path]) -> int:
-        # Remove rows for files that do not exist anymore
-        assert self.conn is not None
-        cur = self.conn.cursor()
-        cur.execute("SELECT path FROM files")
-        rows = cur.fetchall()
-        keep = {str(p) for p in existing_paths}
-        to_delete = [r[0] for r in rows if r[0] not in keep]
-        if not to_delete:
-            return 0
-        cur.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in to_delete))
-        self.conn.commit()
-        return len(to_delete)
+    def set_mirror_many(self, rows: dict[str, MirrorRecord]) -> None:
+        for p, r in rows.items():
+            rel = self._rel(p)
+            if rel is None:
+                continue
+            self._queue.put(
+                (
+                    _SQL_SET_MIRROR,
+                    (rel, r.src_size, r.src_mtime_ns, r.dest_size, r.dest_mtime_ns, bytes.fromhex(r.digest), r.src_dev, r.src_ino, r.algo),
+                )
+            )
 
+    def delete_mirror_many(self, paths: list[str]) -> None:
+        for p in paths:
+            rel = self._rel(p)
+            if rel is not None:
+                self._queue.put((_SQL_DEL_MIRROR, (rel,)))
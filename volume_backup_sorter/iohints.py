@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import ctypes
+import os
+import sys
+
+from .models import IoPolicy
+
+
+# Write-behind window: destination data is pushed to disk in steps of this size and
+# dropped from the page cache one step later, so at most two windows are dirty
+WRITE_BEHIND_BYTES = 8 * 1024 * 1024
+
+_SYNC_FILE_RANGE_WAIT_BEFORE = 1
+_SYNC_FILE_RANGE_WRITE = 2
+_SYNC_FILE_RANGE_WAIT_AFTER = 4
+
+
+_sync_file_range_fn = None
+_sync_file_range_loaded = False
+
+
+def _sync_file_range():
+    # Not exposed by the os module; glibc and musl export it on Linux. Resolved on
+    # first use from the symbols already loaded into the process (no library lookup),
+    # so only runs with the write-behind policy pay for it.
+    global _sync_file_range_fn, _sync_file_range_loaded
+    if _sync_file_range_loaded:
+        return _sync_file_range_fn
+    _sync_file_range_loaded = True
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        fn = ctypes.CDLL(None, use_errno=True).sync_file_range
+    except Exception:
+        return None
+    fn.argtypes = (ctypes.c_int, ctypes.c_int64, ctypes.c_int64, ctypes.c_uint)
+    fn.restype = ctypes.c_int
+    _sync_file_range_fn = fn
+    return fn
+
+
+def _fadvise(fd: int, name: str, offset: int = 0, length: int = 0) -> None:
+    # Hints only: platforms (Windows, macOS) and filesystems without them are ignored
+    advice = getattr(os, name, None)
+    if advice is None:
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        pass
+
+
+def uses_cache(policy: str) -> bool:
+    return policy == IoPolicy.DEFAULT
+
+
+def read_sequential(fd: int, policy: str) -> None:
+    # Larger readahead for a file read front to back once
+    if not uses_cache(policy):
+        _fadvise(fd, "POSIX_FADV_SEQUENTIAL")
+
+
+def drop_cached(fd: int, policy: str) -> None:
+    # Evict a file that was read (or written and flushed) and will not be needed again
+    if not uses_cache(policy):
+        _fadvise(fd, "POSIX_FADV_DONTNEED")
+
+
+class WriteBehind:
+    # Called with the byte count of every write to a destination file. With the
+    # write-behind policy it starts writeback of each completed window and waits for
+    # the previous one before dropping it, so a large copy neither floods the page
+    # cache with dirty pages nor stalls in one big flush at the end.
+
+    def __init__(self, fd: int, policy: str):
+        self.fd = fd
+        self.enabled = policy == IoPolicy.WRITE_BEHIND and _sync_file_range() is not None
+        self._pos = 0
+        self._start = 0
+        self._prev: tuple[int, int] | None = None
+
+    def wrote(self, n: int) -> None:
+        if not self.enabled:
+            return
+        self._pos += n
+        if self._pos - self._start < WRITE_BEHIND_BYTES:
+            return
+        window = (self._start, self._pos - self._start)
+        self._sync(*window, _SYNC_FILE_RANGE_WRITE)
+        if self._prev is not None:
+            self._sync(*self._prev, _SYNC_FILE_RANGE_WAIT_BEFORE | _SYNC_FILE_RANGE_WRITE | _SYNC_FILE_RANGE_WAIT_AFTER)
+            _fadvise(self.fd, "POSIX_FADV_DONTNEED", *self._prev)
+        self._prev = window
+        self._start = self._pos
+
+    def rewind(self) -> None:
+        # The destination was truncated to start over with another copy method
+        self._pos = self._start = 0
+        self._prev = None
+
+    def finish(self) -> None:
+        # Flush what is left, so drop_cached() can evict the whole file
+        if not self.enabled:
+            return
+        self._sync(0, 0, _SYNC_FILE_RANGE_WAIT_BEFORE | _SYNC_FILE_RANGE_WRITE | _SYNC_FILE_RANGE_WAIT_AFTER)
+
+    def _sync(self, offset: int, length: int, flags: int) -> None:
+        fn = _sync_file_range()
+        assert fn is not None
+        if fn(self.fd, offset, length, flags) != 0:
+            # e.g. EINVAL on filesystems that do not support it: stop trying
+            self.enabled = False
@@ -26,6 +26,19 @@ class SymlinkMode:
     LINK = "link"
 
 
+class HashAlgo:
+    SHA256 = "sha256"
+    BLAKE2B = "blake2b"
+
+
+class IoPolicy:
+    DEFAULT = "default"
+    # Keep backup data out of the page cache (posix_fadvise)
+    NOCACHE = "nocache"
+    # Same, and flush destination writes as they happen (sync_file_range)
+    WRITE_BEHIND = "write_behind"
+
+
 class MirrorDeleteScope:
     SUBFOLDER = "subfolder"
     WHOLE_TARGET = "whole_target"
@@ -71,6 +84,10 @@ class PerformanceOptions:
     hash_threads: int = 4
     copy_threads: int = 2
     hash_chunk_mb: int = 4
+    walker_threads: int = 4
+    # Hash files of at least this size from a memory mapping instead of reads (0 = off)
+    mmap_min_mb: int = 0
+    io_policy: str = IoPolicy.DEFAULT
 
     def to_dict(self) -> dict[str, Any]:
         return asdict(self)
@@ -80,10 +97,14 @@ class PerformanceOptions:
         p = PerformanceOptions()
         for k, v in d.items():
             if hasattr(p, k):
-                setattr(p, k, int(v))
+                setattr(p, k, str(v) if k == "io_policy" else int(v))
         p.hash_threads = max(1, min(p.hash_threads, 64))
         p.copy_threads = max(1, min(p.copy_threads, 16))
         p.hash_chunk_mb = max(1, min(p.hash_chunk_mb, 64))
+        p.walker_threads = max(1, min(p.walker_threads, 32))
+        p.mmap_min_mb = max(0, min(p.mmap_min_mb, 1024 * 1024))
+        if p.io_policy not in (IoPolicy.DEFAULT, IoPolicy.NOCACHE, IoPolicy.WRITE_BEHIND):
+            p.io_policy = IoPolicy.DEFAULT
         return p
 
 
@@ -104,10 +125,18 @@ class Profile:
     # If not empty, mirror delete only affects these extensions
     mirror_delete_ext_whitelist: list[str] = field(default_factory=list)
 
+    # Mirror quick-check trusts size + mtime; this additionally compares hashes
+    mirror_checksum: bool = False
+
+    # Content digest for dedup, the index and the mirror manifest
+    hash_algo: str = HashAlgo.SHA256
+
     rules: list[Rule] = field(default_factory=list)
     perf: PerformanceOptions = field(default_factory=PerformanceOptions)
 
     last_run_utc: float = 0.0
+    # Incremental high-water marks per resolved source root (start time of the last full run)
+    last_run_by_root: dict[str, float] = field(default_factory=dict)
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -121,9 +150,12 @@ class Profile:
             "mirror_delete_scope": str(self.mirror_delete_scope),
             "mirror_scope_subdir": str(self.mirror_scope_subdir),
             "mirror_delete_ext_whitelist": list(self.mirror_delete_ext_whitelist or []),
+            "mirror_checksum": bool(self.mirror_checksum),
+            "hash_algo": str(self.hash_algo),
             "rules": [r.to_dict() for r in self.rules],
             "perf": self.perf.to_dict(),
             "last_run_utc": float(self.last_run_utc),
+            "last_run_by_root": {str(k): float(v) for k, v in (self.last_run_by_root or {}).items()},
         }
 
     @staticmethod
@@ -144,10 +176,16 @@ class Profile:
         if isinstance(wl, str):
             wl = [x.strip() for x in wl.split(",")]
         p.mirror_delete_ext_whitelist = [str(x).lower().lstrip(".") for x in wl if str(x).strip()]
+        p.mirror_checksum = bool(d.get("mirror_checksum", False))
+        p.hash_algo = str(d.get("hash_algo") or HashAlgo.SHA256)
+        if p.hash_algo not in (HashAlgo.SHA256, HashAlgo.BLAKE2B):
+            p.hash_algo = HashAlgo.SHA256
 
         p.rules = [Rule.from_dict(x) for x in (d.get("rules") or [])]
         p.perf = PerformanceOptions.from_dict(d.get("perf") or {})
         p.last_run_utc = float(d.get("last_run_utc") or 0.0)
+        marks = d.get("last_run_by_root") or {}
+        p.last_run_by_root = {str(k): float(v or 0.0) for k, v in marks.items()} if isinstance(marks, dict) else {}
 
         if p.mirror_delete_scope not in (
             MirrorDeleteScope.SUBFOLDER,
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Iterator
 import re
+import mimetypes
 
 from .models import Profile, Rule
 from .fsops import guess_mime, sanitize_folder_name, compile_regex
@@ -28,24 +32,164 @@ class PlanSummary:
     bytes_to_copy: int = 0
 
 
-def iter_files(paths: list[str], follow_symlinks: bool) -> Iterable[Path]:
-    for raw in paths:
-        p = Path(raw).expanduser()
-        if not p.exists():
-            yield from ()
-            continue
+@dataclass(frozen=True)
+class SourceEntry:
+    # One enumerated source file. st is taken once during the scan (following a
+    # symlink to its target) and reused by every later stage instead of new stat()s.
+    path: Path
+    st: os.stat_result
+    is_link: bool
+    rel: str  # path relative to the source root it was found under (file name for file roots)
+    root: str = ""  # the source path (as given) this entry was enumerated from
+
+    @property
+    def size(self) -> int:
+        return int(self.st.st_size)
+
+
+@dataclass
+class WalkStats:
+    # Filled in by scan_dirs() as it goes, so callers get totals without a second walk
+    files: int = 0
+    dirs_listed: int = 0
+    dirs_pending: int = 0  # known but not yet consumed (unstarted roots count as one)
+    missing_roots: int = 0
 
-        if p.is_file():
-            yield p
-            continue
+    def estimate(self) -> int:
+        # Files found so far plus the pending folders at the average seen so far;
+        # exact once the walk is done
+        if not self.dirs_pending:
+            return self.files
+        return self.files + int(self.dirs_pending * self.files / max(1, self.dirs_listed))
 
-        if p.is_dir():
-            for root, _, files in os.walk(p):
-                for name in files:
-                    fp = Path(root) / name
-                    if fp.is_symlink() and not follow_symlinks:
+
+def _list_dir(
+    d: str, rel_dir: str, follow_symlinks: bool, root: str
+) -> tuple[list[SourceEntry], list[tuple[str, str]]]:
+    # One folder: its files (stat()ed here, so worker threads absorb the latency)
+    # and its subfolders, in scandir order
+    files: list[SourceEntry] = []
+    subdirs: list[tuple[str, str]] = []
+    try:
+        it = os.scandir(d)
+    except OSError:
+        return files, subdirs
+    with it:
+        try:
+            for e in it:
+                rel = rel_dir + e.name
+                try:
+                    is_link = e.is_symlink()
+                    if e.is_dir():
+                        if not is_link:
+                            subdirs.append((e.path, rel + os.sep))
+                        continue
+                    if is_link and not follow_symlinks:
                         continue
-                    yield fp
+                    est = e.stat()
+                except OSError:
+                    continue
+                if not is_link and not stat.S_ISREG(est.st_mode):
+                    continue
+                files.append(SourceEntry(Path(e.path), est, is_link, rel, root))
+        except OSError:
+            # The listing itself broke off (EIO, a dropped network session): like
+            # os.walk, the folder is skipped and the walk goes on. Covers the pool
+            # path too, since list_node() never sees the error.
+            return [], []
+    return files, subdirs
+
+
+def scan_dirs(
+    paths: list[str], follow_symlinks: bool, workers: int = 1, stats: WalkStats | None = None
+) -> Iterator[list[SourceEntry]]:
+    # The files of one folder per item (a file given as a source is a batch of its
+    # own; empty folders yield nothing). Same selection and order as os.walk (files of
+    # a folder, then its subfolders; symlinked folders are not descended), built on
+    # scandir so each file costs one stat. Broken symlinks and special files (fifos,
+    # sockets, ...) are skipped.
+    #
+    # With workers > 1, folders are listed ahead of the consumer on a thread pool: a
+    # finished listing schedules its own subfolders right away, so on network shares
+    # many round-trips are in flight. At most workers * 64 listings are outstanding
+    # (running or finished but not yet consumed), and results still come out in walk order.
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vbs-walk") if workers > 1 else None
+    ahead = workers * 64
+    lock = threading.Lock()
+    outstanding = 0
+
+    def take() -> bool:
+        nonlocal outstanding
+        with lock:
+            if outstanding >= ahead:
+                return False
+            outstanding += 1
+            return True
+
+    def list_node(node: list, root: str) -> tuple[list[SourceEntry], list[list]]:
+        # node: [path, rel, future or None]
+        files, subdirs = _list_dir(node[0], node[1], follow_symlinks, root)
+        kids = [[sd, rel, None] for sd, rel in subdirs]
+        if pool is not None:
+            for k in kids:
+                if not take():
+                    break
+                k[2] = pool.submit(list_node, k, root)
+        return files, kids
+
+    stats = stats if stats is not None else WalkStats()
+    try:
+        for i, raw in enumerate(paths):
+            stats.dirs_pending = len(paths) - i
+            p = Path(raw).expanduser()
+            try:
+                st = p.stat()
+            except OSError:
+                stats.missing_roots += 1
+                continue
+
+            if stat.S_ISREG(st.st_mode):
+                stats.files += 1
+                yield [SourceEntry(p, st, p.is_symlink(), p.name, raw)]
+                continue
+            if not stat.S_ISDIR(st.st_mode):
+                continue
+
+            stack: list[list] = [[str(p), "", None]]
+            while stack:
+                node = stack.pop()
+                if node[2] is not None:
+                    files, kids = node[2].result()
+                    with lock:
+                        outstanding -= 1
+                else:
+                    files, kids = list_node(node, raw)
+                stack.extend(reversed(kids))
+                stats.files += len(files)
+                stats.dirs_listed += 1
+                stats.dirs_pending = len(stack) + len(paths) - i - 1
+
+                if pool is not None:
+                    # Top up from the next folders in walk order
+                    for item in reversed(stack):
+                        if item[2] is None:
+                            if not take():
+                                break
+                            item[2] = pool.submit(list_node, item, raw)
+
+                if files:
+                    yield files
+        stats.dirs_pending = 0
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_files(
+    paths: list[str], follow_symlinks: bool, workers: int = 1, stats: WalkStats | None = None
+) -> Iterator[SourceEntry]:
+    for files in scan_dirs(paths, follow_symlinks, workers, stats):
+        yield from files
 
 
 def rule_matches(rule: Rule, src: Path, mime: str, size: int, regex_cache: dict[str, re.Pattern | None]) -> bool:
@@ -87,21 +231,168 @@ def rule_matches(rule: Rule, src: Path, mime: str, size: int, regex_cache: dict[
     return True
 
 
-def dest_for_rules(profile: Profile, target_root: Path, src: Path, size: int) -> Path:
-    mime = guess_mime(src)
-    regex_cache: dict[str, re.Pattern | None] = {}
+@dataclass(frozen=True)
+class _CompiledRule:
+    folder: str
+    extensions: frozenset[str]
+    mime_prefixes: tuple[str, ...]
+    rx: re.Pattern | None
+    path_contains: str
+    min_bytes: int
+    max_bytes: int
+
+
+class RuleMatcher:
+    # A profile's rules compiled once per run; same first-match result as rule_matches()
+    # over profile.rules. Disabled rules and rules with an invalid regex (which never
+    # match) are dropped up front. Each extension maps to the rules that can accept it,
+    # in profile order, so a file is only tested against its candidates; the MIME type
+    # and the lowercased path are computed once, and only if a candidate asks for them.
+    # Safe to share between threads: the caches below only ever gain identical entries.
+
+    def __init__(self, rules: list[Rule]):
+        compiled: list[_CompiledRule] = []
+        for r in rules:
+            if not r.enabled:
+                continue
+            rx = compile_regex(r.name_regex) if r.name_regex else None
+            if r.name_regex and rx is None:
+                continue
+            compiled.append(
+                _CompiledRule(
+                    folder=sanitize_folder_name(r.target_folder),
+                    extensions=frozenset(r.extensions or ()),
+                    mime_prefixes=tuple(r.mime_prefixes or ()),
+                    rx=rx,
+                    path_contains=(r.path_contains or "").lower(),
+                    min_bytes=r.size_min_mb * 1024 * 1024 if r.size_min_mb else 0,
+                    max_bytes=r.size_max_mb * 1024 * 1024 if r.size_max_mb else 0,
+                )
+            )
+        # Rules without an extension list accept every extension
+        self._any_ext = tuple(c for c in compiled if not c.extensions)
+        all_exts = {e for c in compiled for e in c.extensions}
+        self._by_ext = {
+            e: tuple(c for c in compiled if not c.extensions or e in c.extensions)
+            for e in all_exts
+        }
+        self._mime_by_suffix: dict[str, str] = {}
+        self._bases: dict[tuple[Path, str], Path] = {}
+
+    def _mime(self, src: Path, suffix: str) -> str:
+        # guess_mime() only looks at the last suffix, unless that one is a compression
+        # or alias suffix (.gz, .tgz, ...) or the name is a dotfile; those are not cached
+        if not suffix or src.name.startswith("."):
+            return guess_mime(src)
+        mime = self._mime_by_suffix.get(suffix)
+        if mime is not None:
+            return mime
+        mime = guess_mime(src)
+        low = suffix.lower()
+        if low not in mimetypes.suffix_map and suffix not in mimetypes.encodings_map and low not in mimetypes.encodings_map:
+            self._mime_by_suffix[suffix] = mime
+        return mime
+
+    def _base(self, target_root: Path, folder: str) -> Path:
+        base = self._bases.get((target_root, folder))
+        if base is None:
+            base = self._bases[(target_root, folder)] = target_root / folder
+        return base
+
+    def folder_for(self, src: Path, size: int) -> str:
+        mime: str | None = None
+        path_lower: str | None = None
+        suffix = src.suffix
+        for c in self._by_ext.get(suffix.lower().lstrip("."), self._any_ext):
+            if c.min_bytes and size < c.min_bytes:
+                continue
+            if c.max_bytes and size > c.max_bytes:
+                continue
+            if c.path_contains:
+                if path_lower is None:
+                    path_lower = str(src).lower()
+                if c.path_contains not in path_lower:
+                    continue
+            if c.rx is not None and not c.rx.search(src.name):
+                continue
+            if c.mime_prefixes:
+                if mime is None:
+                    mime = self._mime(src, suffix)
+                if not mime or not mime.startswith(c.mime_prefixes):
+                    continue
+            return c.folder
+        return "misc"
+
+    def dest(self, target_root: Path, src: Path, size: int) -> Path:
+        return self._base(target_root, self.folder_for(src, size)) / src.name
 
-    for r in profile.rules:
-        if rule_matches(r, src, mime, size, regex_cache):
-            folder = sanitize_folder_name(r.target_folder)
-            return target_root / folder / src.name
+    def folders_for_dir(self, entries: list[SourceEntry]) -> list[str]:
+        # folder_for() every file of one folder (a scan_dirs() batch), in order. A
+        # path_contains needle found in the folder path holds for all its files;
+        # otherwise only the end of the folder path plus the file name can contain it.
+        # Files are grouped by suffix, so each group looks up its candidates once.
+        if not entries:
+            return []
+        parent = str(entries[0].path.parent).lower()
+        if not parent.endswith(os.sep):
+            parent += os.sep
+        in_dir = {
+            c.path_contains: c.path_contains in parent
+            for cands in (self._any_ext, *self._by_ext.values())
+            for c in cands
+            if c.path_contains
+        }
 
-    return target_root / "misc" / src.name
+        groups: dict[str, list[int]] = {}
+        for i, e in enumerate(entries):
+            groups.setdefault(e.path.suffix, []).append(i)
+
+        out = ["misc"] * len(entries)
+        for suffix, idxs in groups.items():
+            cands = self._by_ext.get(suffix.lower().lstrip("."), self._any_ext)
+            if not cands:
+                continue
+            for i in idxs:
+                e = entries[i]
+                src = e.path
+                name = src.name
+                size = e.st.st_size
+                mime: str | None = None
+                name_lower: str | None = None
+                for c in cands:
+                    if c.min_bytes and size < c.min_bytes:
+                        continue
+                    if c.max_bytes and size > c.max_bytes:
+                        continue
+                    if c.path_contains and not in_dir[c.path_contains]:
+                        if name_lower is None:
+                            name_lower = name.lower()
+                        n = c.path_contains
+                        if n not in parent[max(0, len(parent) - len(n) + 1):] + name_lower:
+                            continue
+                    if c.rx is not None and not c.rx.search(name):
+                        continue
+                    if c.mime_prefixes:
+                        if mime is None:
+                            mime = self._mime(src, suffix)
+                        if not mime or not mime.startswith(c.mime_prefixes):
+                            continue
+                    out[i] = c.folder
+                    break
+        return out
+
+    def dest_in(self, target_root: Path, folder: str, src: Path) -> Path:
+        # Destination for a folder from folders_for_dir()
+        return self._base(target_root, folder) / src.name
+
+
+def dest_for_rules(profile: Profile, target_root: Path, src: Path, size: int) -> Path:
+    # One-off lookup; callers deciding many files build a RuleMatcher once instead
+    return RuleMatcher(profile.rules).dest(target_root, src, size)
 
 
-def dest_for_mirror(base_root: Path, source_root: Path, src: Path) -> Path:
-    rel = src.resolve().relative_to(source_root.resolve())
-    return base_root / rel
+def dest_for_mirror(base_root: Path, entry: SourceEntry) -> Path:
+    return base_root / entry.rel
 
 
 def infer_source_roots(source_paths: list[str]) -> list[Path]:
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+
+# Rows not used by any run for this many days are dropped when the cache is opened
+KEEP_DAYS = 90
+
+
+def _today() -> int:
+    return int(time.time() // 86400)
+
+
+@dataclass(frozen=True)
+class SourceRecord:
+    size: int
+    mtime_ns: int
+    digest: str = ""
+    fp: str = ""
+    algo: str = "sha256"
+    last_seen: int = 0  # day number, see _today()
+
+
+class SourceHashCache:
+    # Hashes of source files, keyed by (device, inode) and valid while size and
+    # mtime_ns are unchanged. The fingerprint is algorithm-independent; the digest
+    # is only valid for the algorithm stored next to it. The rows of a device are
+    # loaded into memory the first time one of its files is looked up, so a run only
+    # pays for the volumes it reads. Writes and last_seen updates are queued and
+    # flushed by the thread that opened the cache; rows unused for KEEP_DAYS go.
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.conn: sqlite3.Connection | None = None
+        self._rows: dict[tuple[int, int], SourceRecord] = {}
+        self._pending: dict[tuple[int, int], SourceRecord] = {}
+        self._seen: set[tuple[int, int]] = set()  # hits whose last_seen is older than today
+        self._loaded: set[int] = set()
+        self._today = _today()
+        # Guards the dicts and the connection, which the hash threads use to load rows
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        cur = self.conn.cursor()
+
+        cur.execute("PRAGMA journal_mode=WAL;")
+        cur.execute("PRAGMA synchronous=NORMAL;")
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS source_hashes (
+                dev       INTEGER NOT NULL,
+                ino       INTEGER NOT NULL,
+                size      INTEGER NOT NULL,
+                mtime_ns  INTEGER NOT NULL,
+                digest    TEXT NOT NULL,
+                fp        TEXT NOT NULL,
+                algo      TEXT NOT NULL DEFAULT 'sha256',
+                last_seen INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dev, ino)
+            )
+            """
+        )
+        # Caches written before the digest algorithm was configurable hold SHA-256 only
+        cols = {r[1] for r in cur.execute("PRAGMA table_info(source_hashes)")}
+        if "sha256" in cols:
+            cur.execute("ALTER TABLE source_hashes RENAME COLUMN sha256 TO digest")
+        if "algo" not in cols:
+            cur.execute("ALTER TABLE source_hashes ADD COLUMN algo TEXT NOT NULL DEFAULT 'sha256'")
+        if "last_seen" not in cols:
+            # Older rows start their KEEP_DAYS from now
+            cur.execute("ALTER TABLE source_hashes ADD COLUMN last_seen INTEGER NOT NULL DEFAULT 0")
+            cur.execute("UPDATE source_hashes SET last_seen = ?", (self._today,))
+        cur.execute("DELETE FROM source_hashes WHERE last_seen < ?", (self._today - KEEP_DAYS,))
+        self.conn.commit()
+
+    def _load_dev(self, dev: int) -> None:
+        # Caller holds self._lock
+        if dev in self._loaded or self.conn is None:
+            return
+        self._loaded.add(dev)
+        for ino, size, mtime_ns, digest, fp, algo, last_seen in self.conn.execute(
+            "SELECT ino, size, mtime_ns, digest, fp, algo, last_seen FROM source_hashes WHERE dev = ?", (dev,)
+        ):
+            self._rows[(dev, int(ino))] = SourceRecord(
+                int(size), int(mtime_ns), str(digest), str(fp), str(algo), int(last_seen)
+            )
+
+    def close(self) -> None:
+        if not self.conn:
+            return
+        try:
+            self.flush()
+        except Exception:
+            pass
+        self.conn.close()
+        self.conn = None
+
+    @staticmethod
+    def _key(st: os.stat_result) -> tuple[int, int] | None:
+        # Some filesystems (FAT, a few network shares) report no inode numbers
+        if not st.st_ino:
+            return None
+        return int(st.st_dev), int(st.st_ino)
+
+    def get(self, st: os.stat_result) -> SourceRecord | None:
+        key = self._key(st)
+        if key is None:
+            return None
+        with self._lock:
+            self._load_dev(key[0])
+            rec = self._pending.get(key) or self._rows.get(key)
+            if rec and rec.size == st.st_size and rec.mtime_ns == st.st_mtime_ns:
+                if rec.last_seen < self._today:
+                    self._seen.add(key)
+                return rec
+        return None
+
+    def put(self, st: os.stat_result, digest: str = "", fp: str = "", algo: str = "sha256") -> None:
+        # algo names the algorithm of `digest`; without a digest the cached one is kept
+        key = self._key(st)
+        if key is None:
+            return
+        with self._lock:
+            self._load_dev(key[0])
+            old = self._pending.get(key) or self._rows.get(key)
+            if old and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns:
+                if not digest:
+                    digest, algo = old.digest, old.algo
+                fp = fp or old.fp
+            self._pending[key] = SourceRecord(int(st.st_size), int(st.st_mtime_ns), digest, fp, algo, self._today)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._seen)
+
+    def flush(self) -> None:
+        assert self.conn is not None
+        with self._lock:
+            batch = self._pending
+            seen = [k for k in self._seen if k not in batch]
+            self._pending = {}
+            self._seen = set()
+            self._rows.update(batch)
+            for k in seen:
+                self._rows[k] = replace(self._rows[k], last_seen=self._today)
+            if not batch and not seen:
+                return
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO source_hashes(dev, ino, size, mtime_ns, digest, fp, algo, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((k[0], k[1], r.size, r.mtime_ns, r.digest, r.fp, r.algo, r.last_seen) for k, r in batch.items()),
+            )
+            self.conn.executemany(
+                "UPDATE source_hashes SET last_seen = ? WHERE dev = ? AND ino = ?",
+                ((self._today, k[0], k[1]) for k in seen),
+            )
+            self.conn.commit()
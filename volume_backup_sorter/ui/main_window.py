@@ -332,7 +332,7 @@ class MainWindow(QMainWindow):
                 if t:
                     QDesktopServices.openUrl(QUrl.fromLocalFile(t))
 
-        self._append(f"Copied: {res.copied}, dup skipped: {res.skipped_duplicates}, mirror deleted: {res.deleted_mirror}")
+        self._append(f"Copied: {res.copied}, dup skipped: {res.skipped_duplicates}, mirror deleted: {res.deleted_mirror}, failed: {res.failed}")
 
     def _set_running(self, running: bool):
         self.btn_start.setEnabled(not running)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QFormLayout, QLabel, QPushButton, QHBoxLayout
 
 from ..i18n import I18N
-from ..worker import RunResult
+from ..engine import RunResult
 
 
 def _human_bytes(n: int) -> str:
@@ -27,7 +27,7 @@ class PreviewDialog(QDialog):
 
         self.setWindowTitle(self.i18n.t("preview.dialog.title"))
         self.setModal(True)
-        self.resize(520, 240)
+        self.resize(520, 280)
 
         root = QVBoxLayout(self)
         form = QFormLayout()
@@ -35,7 +35,9 @@ class PreviewDialog(QDialog):
         form.addRow(QLabel(self.i18n.t("preview.files_total")), QLabel(str(res.total_sources)))
         form.addRow(QLabel(self.i18n.t("preview.copy")), QLabel(str(res.copied)))
         form.addRow(QLabel(self.i18n.t("preview.skip_dup")), QLabel(str(res.skipped_duplicates)))
+        form.addRow(QLabel(self.i18n.t("preview.skip_unchanged")), QLabel(str(res.skipped_unchanged)))
         form.addRow(QLabel(self.i18n.t("preview.skip_missing")), QLabel(str(res.skipped_missing_sources)))
+        form.addRow(QLabel(self.i18n.t("preview.move_mirror")), QLabel(str(res.moved_mirror)))
         form.addRow(QLabel(self.i18n.t("preview.delete_mirror")), QLabel(str(res.deleted_mirror)))
         form.addRow(QLabel(self.i18n.t("preview.bytes")), QLabel(_human_bytes(res.bytes_copied)))
 
@@ -13,7 +13,7 @@ from ..i18n import I18N, LANGUAGES
 from ..models import (
     AppConfig, Profile, Rule,
     BackupMode, ConflictStrategy, SymlinkMode,
-    MirrorDeleteScope
+    MirrorDeleteScope, HashAlgo, IoPolicy
 )
 from ..config_store import save_config
 from .rule_editor import RuleEditorDialog
@@ -53,6 +53,21 @@ def _mirror_scope_items(i18n: I18N):
     ]
 
 
+def _hash_algo_items(i18n: I18N):
+    return [
+        (HashAlgo.SHA256, i18n.t("hash.sha256")),
+        (HashAlgo.BLAKE2B, i18n.t("hash.blake2b")),
+    ]
+
+
+def _io_policy_items(i18n: I18N):
+    return [
+        (IoPolicy.DEFAULT, i18n.t("io.default")),
+        (IoPolicy.NOCACHE, i18n.t("io.nocache")),
+        (IoPolicy.WRITE_BEHIND, i18n.t("io.write_behind")),
+    ]
+
+
 def _split_csv(s: str) -> list[str]:
     out = []
     for x in (s or "").split(","):
@@ -128,6 +143,7 @@ class SettingsDialog(QDialog):
         self.cmb_mirror_scope = QComboBox()
         self.ed_mirror_subdir = QLineEdit()
         self.ed_mirror_whitelist = QLineEdit()
+        self.chk_mirror_checksum = QCheckBox(self.i18n.t("settings.mirror_checksum"))
 
         form.addRow(QLabel(self.i18n.t("settings.language")), self.cmb_lang)
         form.addRow(QLabel(self.i18n.t("settings.mode")), self.cmb_mode)
@@ -137,6 +153,7 @@ class SettingsDialog(QDialog):
         form.addRow(QLabel(self.i18n.t("settings.mirror_scope")), self.cmb_mirror_scope)
         form.addRow(QLabel(self.i18n.t("settings.mirror_subdir")), self.ed_mirror_subdir)
         form.addRow(QLabel(self.i18n.t("settings.mirror_whitelist")), self.ed_mirror_whitelist)
+        form.addRow(self.chk_mirror_checksum)
 
         form.addRow(self.chk_meta)
         form.addRow(self.chk_open)
@@ -285,9 +302,23 @@ class SettingsDialog(QDialog):
         self.sp_chunk = QSpinBox()
         self.sp_chunk.setRange(1, 64)
 
+        self.sp_walk = QSpinBox()
+        self.sp_walk.setRange(1, 32)
+
+        self.sp_mmap = QSpinBox()
+        self.sp_mmap.setRange(0, 1024 * 1024)
+
+        self.cmb_hash_algo = QComboBox()
+
+        self.cmb_io_policy = QComboBox()
+
         form.addRow(QLabel(self.i18n.t("perf.hash_threads")), self.sp_hash)
         form.addRow(QLabel(self.i18n.t("perf.copy_threads")), self.sp_copy)
         form.addRow(QLabel(self.i18n.t("perf.chunk_mb")), self.sp_chunk)
+        form.addRow(QLabel(self.i18n.t("perf.walker_threads")), self.sp_walk)
+        form.addRow(QLabel(self.i18n.t("perf.hash_algo")), self.cmb_hash_algo)
+        form.addRow(QLabel(self.i18n.t("perf.mmap_min_mb")), self.sp_mmap)
+        form.addRow(QLabel(self.i18n.t("perf.io_policy")), self.cmb_io_policy)
 
         lay.addLayout(form)
         lay.addStretch(1)
@@ -419,6 +450,14 @@ class SettingsDialog(QDialog):
         for k, label in _mirror_scope_items(self.i18n):
             self.cmb_mirror_scope.addItem(label, k)
 
+        self.cmb_hash_algo.clear()
+        for k, label in _hash_algo_items(self.i18n):
+            self.cmb_hash_algo.addItem(label, k)
+
+        self.cmb_io_policy.clear()
+        for k, label in _io_policy_items(self.i18n):
+            self.cmb_io_policy.addItem(label, k)
+
         prof = self.active_profile()
 
         self.cmb_mode.setCurrentIndex(max(0, self.cmb_mode.findData(prof.mode)))
@@ -428,6 +467,7 @@ class SettingsDialog(QDialog):
         self.cmb_mirror_scope.setCurrentIndex(max(0, self.cmb_mirror_scope.findData(prof.mirror_delete_scope)))
         self.ed_mirror_subdir.setText(prof.mirror_scope_subdir or "mirror")
         self.ed_mirror_whitelist.setText(", ".join(prof.mirror_delete_ext_whitelist or []))
+        self.chk_mirror_checksum.setChecked(bool(prof.mirror_checksum))
 
         self.chk_meta.setChecked(bool(prof.preserve_metadata))
         self.chk_open.setChecked(bool(prof.auto_open_target))
@@ -435,6 +475,10 @@ class SettingsDialog(QDialog):
         self.sp_hash.setValue(int(prof.perf.hash_threads))
         self.sp_copy.setValue(int(prof.perf.copy_threads))
         self.sp_chunk.setValue(int(prof.perf.hash_chunk_mb))
+        self.sp_walk.setValue(int(prof.perf.walker_threads))
+        self.sp_mmap.setValue(int(prof.perf.mmap_min_mb))
+        self.cmb_io_policy.setCurrentIndex(max(0, self.cmb_io_policy.findData(prof.perf.io_policy)))
+        self.cmb_hash_algo.setCurrentIndex(max(0, self.cmb_hash_algo.findData(prof.hash_algo)))
 
         self._reload_profiles_ui()
         self._reload_rules_table()
@@ -455,6 +499,7 @@ class SettingsDialog(QDialog):
 
         wl = [x.lower().lstrip(".") for x in _split_csv(self.ed_mirror_whitelist.text())]
         prof.mirror_delete_ext_whitelist = wl
+        prof.mirror_checksum = bool(self.chk_mirror_checksum.isChecked())
 
         if prof.mirror_delete_scope == MirrorDeleteScope.SUBFOLDER and not prof.mirror_scope_subdir:
             QMessageBox.warning(self, self.i18n.t("ui.info_title"), self.i18n.t("msg.mirror_subdir_empty"))
@@ -463,6 +508,10 @@ class SettingsDialog(QDialog):
         prof.perf.hash_threads = int(self.sp_hash.value())
         prof.perf.copy_threads = int(self.sp_copy.value())
         prof.perf.hash_chunk_mb = int(self.sp_chunk.value())
+        prof.perf.walker_threads = int(self.sp_walk.value())
+        prof.perf.mmap_min_mb = int(self.sp_mmap.value())
+        prof.perf.io_policy = str(self.cmb_io_policy.currentData() or prof.perf.io_policy)
+        prof.hash_algo = str(self.cmb_hash_algo.currentData() or prof.hash_algo)
 
         save_config(self.cfg)
         self.accept()